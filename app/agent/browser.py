@@ -1,5 +1,8 @@
-import json
-from typing import Any, Optional
+import asyncio
+import math
+from functools import cached_property, lru_cache
+from string import Formatter
+from typing import Any, Optional, Tuple
 
 from pydantic import Field
 
@@ -8,6 +11,50 @@ from app.logger import logger
 from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import Message, ToolChoice
 from app.tool import BrowserUseTool, Terminate, ToolCollection
+from app.utils.json import loads as _json_loads
+
+
+# 浏览器工具和终止工具名称，导入时计算一次
+_BROWSER_TOOL_NAME = BrowserUseTool().name
+_TERMINATE_NAME = Terminate().name
+
+# 超过该大小的浏览器状态在线程中解析，避免阻塞事件循环
+_LARGE_STATE_BYTES = 64 * 1024
+
+# 滚动像素按此粒度向上取整，提高提示语缓存命中率
+_PIXEL_BUCKET = 100
+
+# 导入时将下一步提示语模板预先拆分为（静态片段, 占位符名）序列，渲染时无需重新解析格式串
+_NEXT_STEP_PARTS = tuple(
+    (literal, field) for literal, field, _, _ in Formatter().parse(NEXT_STEP_PROMPT)
+)
+
+
+@lru_cache(maxsize=256)
+def _format_next_step(
+    url_info: str,
+    tabs_info: str,
+    content_above_info: str,
+    content_below_info: str,
+    results_info: str,
+) -> str:
+    """格式化下一步提示语，相同的占位符组合直接复用缓存结果。"""
+    values = {
+        "url_placeholder": url_info,
+        "tabs_placeholder": tabs_info,
+        "content_above_placeholder": content_above_info,
+        "content_below_placeholder": content_below_info,
+        "results_placeholder": results_info,
+    }
+    return "".join(
+        literal + values[field] if field else literal
+        for literal, field in _NEXT_STEP_PARTS
+    )
+
+
+def _bucket_pixels(pixels: int) -> int:
+    """将像素值向上取整到 _PIXEL_BUCKET 的倍数，非零值不会被取整为 0。"""
+    return math.ceil(pixels / _PIXEL_BUCKET) * _PIXEL_BUCKET
 
 
 class BrowserAgent(ToolCallAgent):
@@ -33,9 +80,13 @@ class BrowserAgent(ToolCallAgent):
 
     # 使用 Auto 作为工具选择，允许工具使用和自由形式响应
     tool_choices: ToolChoice = ToolChoice.AUTO
-    special_tool_names: list[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: list[str] = Field(default_factory=lambda: [_TERMINATE_NAME])
 
-    _current_base64_image: Optional[str] = None  # 当前的 base64 编码图片
+
+    @cached_property
+    def _browser_tool(self) -> Optional[BrowserUseTool]:
+        """从可用工具中解析一次浏览器工具引用并缓存。"""
+        return self.available_tools.get_tool(_BROWSER_TOOL_NAME)
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """
@@ -45,18 +96,19 @@ class BrowserAgent(ToolCallAgent):
         if not self._is_special_tool(name):
             return
         else:
-            await self.available_tools.get_tool(BrowserUseTool().name).cleanup()
+            await self._browser_tool.cleanup()
             await super()._handle_special_tool(name, result, **kwargs)
 
-    async def get_browser_state(self) -> Optional[dict]:
+    async def get_browser_state(self) -> Tuple[Optional[dict], Optional[str]]:
         """
         获取当前浏览器的状态，用于下一步的上下文。
-        从工具中直接获取浏览器状态，如果成功则存储截图并解析状态信息。
-        如果发生错误或获取失败，则返回 None。
+        从工具中直接获取浏览器状态，如果成功则返回解析后的状态信息和截图。
+        截图不保存在代理上，由调用方在当前步骤中直接使用。
+        如果发生错误或获取失败，则返回 (None, None)。
         """
-        browser_tool = self.available_tools.get_tool(BrowserUseTool().name)
+        browser_tool = self._browser_tool
         if not browser_tool:
-            return None
+            return None, None
 
         try:
             # Get browser state directly from the tool
@@ -64,18 +116,20 @@ class BrowserAgent(ToolCallAgent):
 
             if result.error:
                 logger.debug(f"浏览器状态错误: {result.error}")
-                return None
+                return None, None
 
-            # Store screenshot if available
-            if hasattr(result, "base64_image") and result.base64_image:
-                self._current_base64_image = result.base64_image
+            base64_image = getattr(result, "base64_image", None) or None
 
             # Parse the state info
-            return json.loads(result.output)
+            if len(result.output) > _LARGE_STATE_BYTES:
+                state = await asyncio.to_thread(_json_loads, result.output)
+            else:
+                state = _json_loads(result.output)
+            return state, base64_image
 
         except Exception as e:
             logger.debug(f"获取浏览器状态失败: {str(e)}")
-            return None
+            return None, None
 
     async def think(self) -> bool:
         """
@@ -83,8 +137,6 @@ class BrowserAgent(ToolCallAgent):
         获取浏览器状态，并根据状态更新提示语中的占位符。
         调用父类的 think 方法，并在之后重置提示语。
         """
-        browser_state = await self.get_browser_state()
-
         # 初始化占位符的值
         url_info = ""
         tabs_info = ""
@@ -92,6 +144,8 @@ class BrowserAgent(ToolCallAgent):
         content_below_info = ""
         results_info = ""
 
+        browser_state, base64_image = await self.get_browser_state()
+
         if browser_state and not browser_state.get("error"):
             # URL 和标题信息
             url_info = f"\n   URL: {browser_state.get('url', 'N/A')}\n   Title: {browser_state.get('title', 'N/A')}"
@@ -102,9 +156,9 @@ class BrowserAgent(ToolCallAgent):
                 if tabs:
                     tabs_info = f"\n   {len(tabs)} 个标签可用"
 
-            # 视口上下内容的信息
-            pixels_above = browser_state.get("pixels_above", 0)
-            pixels_below = browser_state.get("pixels_below", 0)
+            # 视口上下内容的信息（按粒度取整）
+            pixels_above = _bucket_pixels(browser_state.get("pixels_above", 0))
+            pixels_below = _bucket_pixels(browser_state.get("pixels_below", 0))
 
             if pixels_above > 0:
                 content_above_info = f" ({pixels_above} pixels)"
@@ -113,21 +167,17 @@ class BrowserAgent(ToolCallAgent):
                 content_below_info = f" ({pixels_below} pixels)"
 
             # 如果有截图，则添加到消息中
-            if self._current_base64_image:
+            if base64_image:
                 # Create a message with image attachment
                 image_message = Message.user_message(
                     content="当前浏览器截图:",
-                    base64_image=self._current_base64_image,
+                    base64_image=base64_image,
                 )
                 self.memory.add_message(image_message)
 
         # 使用实际的浏览器状态信息替换提示语中的占位符
-        self.next_step_prompt = NEXT_STEP_PROMPT.format(
-            url_placeholder=url_info,
-            tabs_placeholder=tabs_info,
-            content_above_placeholder=content_above_info,
-            content_below_placeholder=content_below_info,
-            results_placeholder=results_info,
+        self.next_step_prompt = _format_next_step(
+            url_info, tabs_info, content_above_info, content_below_info, results_info
         )
 
         # 调用父类的 think 方法
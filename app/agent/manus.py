@@ -1,9 +1,13 @@
+import asyncio
+from typing import List
+
 from pydantic import Field
 
 from app.agent.browser import BrowserAgent  # 导入浏览器代理类
 from app.config import config  # 导入配置模块
 from app.prompt.browser import NEXT_STEP_PROMPT as BROWSER_NEXT_STEP_PROMPT  # 导入浏览器下一步提示语，并重命名为 BROWSER_NEXT_STEP_PROMPT
 from app.prompt.manus import NEXT_STEP_PROMPT, SYSTEM_PROMPT  # 导入手稿的下一步提示语和系统提示语
+from app.schema import ToolCall  # 导入工具调用类
 from app.tool import Terminate, ToolCollection  # 导入终止工具和工具集合
 from app.tool.browser_use_tool import BrowserUseTool  # 导入浏览器使用工具
 from app.tool.python_execute import PythonExecute  # 导入 Python 执行工具
@@ -14,6 +18,13 @@ from app.tool.html_to_springboot import HTMLToSpringboot  # 导入将HTML原型
 from app.tool.html_to_api_doc import HTMLToAPIDoc  # 导入将HTML原型界面转换为API接口文档的工具
 from app.tool.html_to_vue import HTMLToVue  # 导入将HTML原型界面转换为Vue前端项目的工具
 
+
+# 系统提示语只在导入时格式化一次，所有实例共享
+_SYSTEM_PROMPT = SYSTEM_PROMPT.format(directory=config.workspace_root)
+
+_BROWSER_TOOL_NAME = BrowserUseTool().name  # 浏览器工具名称
+
+
 class Manus(BrowserAgent):
     """
     Manus 是一个多功能通用代理，使用规划来解决各种任务。
@@ -28,11 +39,12 @@ class Manus(BrowserAgent):
         "A versatile agent that can solve various tasks using multiple tools"
     )
 
-    system_prompt: str = SYSTEM_PROMPT.format(directory=config.workspace_root)  # 格式化系统提示语，使用配置中的工作区根目录
+    system_prompt: str = _SYSTEM_PROMPT  # 使用预先格式化的系统提示语（包含工作区根目录）
     next_step_prompt: str = NEXT_STEP_PROMPT  # 设置下一步提示语
 
     max_observe: int = 10000  # 最大观察次数
     max_steps: int = 20  # 最大步骤数
+    max_concurrency: int = 4  # 批量运行时同时执行的任务数上限
 
     # 向工具集合添加通用工具
     available_tools: ToolCollection = Field(
@@ -41,17 +53,38 @@ class Manus(BrowserAgent):
         )
     )
 
+    _last_browser_step: int = -1  # 最近一次调用浏览器工具的步骤，-1 表示尚未调用
+
+    async def run_batch_async(self, requests: List[str]) -> List[str]:
+        """并发处理多个请求，每个请求使用独立的代理实例，结果顺序与请求一致。"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run_one(request: str) -> str:
+            async with semaphore:
+                agent = self.__class__(llm=self.llm, max_steps=self.max_steps)
+                return await agent.run(request)
+
+        return list(await asyncio.gather(*(_run_one(request) for request in requests)))
+
+    def run_batch(self, requests: List[str]) -> List[str]:
+        """run_batch_async 的同步入口。"""
+        return asyncio.run(self.run_batch_async(requests))
+
+    async def execute_tool(self, command: ToolCall) -> str:
+        """执行工具调用，并记录浏览器工具的使用步骤。"""
+        if command and command.function and command.function.name == _BROWSER_TOOL_NAME:
+            self._last_browser_step = self.current_step
+        return await super().execute_tool(command)
+
     async def think(self) -> bool:
         """处理当前状态并根据适当的上下文决定下一步行动。"""
         # 存储原始提示语
         original_prompt = self.next_step_prompt
 
-        # 仅检查最近的消息（最后 3 条）以确定是否有浏览器活动
-        recent_messages = self.memory.messages[-3:] if self.memory.messages else []
-        browser_in_use = any(
-            "browser_use" in msg.content.lower()
-            for msg in recent_messages
-            if hasattr(msg, "content") and isinstance(msg.content, str)  # 检查消息内容是否包含 "browser_use"
+        # 上一步使用过浏览器工具时视为浏览器活动中
+        browser_in_use = (
+            self._last_browser_step >= 0
+            and 0 <= self.current_step - self._last_browser_step <= 1
         )
 
         if browser_in_use:
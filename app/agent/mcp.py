@@ -28,6 +28,7 @@ class MCPAgent(ToolCallAgent):
 
     max_steps: int = 20  # 最大步骤数
     connection_type: str = "stdio"  # 连接类型，"stdio" 或 "sse"
+    parallel_tools: bool = True  # 每次工具调用都是独立的MCP请求，同一轮的调用并发发送
 
     # 跟踪工具模式以检测更改
     tool_schemas: Dict[str, Dict[str, Any]] = Field(default_factory=dict)  # 工具模式字典
@@ -94,8 +95,13 @@ class MCPAgent(ToolCallAgent):
 
         # 直接从服务器获取当前工具模式
         response = await self.mcp_clients.session.list_tools()
+
         current_tools = {tool.name: tool.inputSchema for tool in response.tools}
 
+        # 工具列表未变化时直接返回，无需逐个比较模式
+        if current_tools == self.tool_schemas:
+            return [], []
+
         # 确定新增、移除和更改的工具
         current_names = set(current_tools.keys())
         previous_names = set(self.tool_schemas.keys())
@@ -112,7 +118,11 @@ class MCPAgent(ToolCallAgent):
         # 更新存储的模式
         self.tool_schemas = current_tools
 
-        # 记录并通知更改
+        # 没有任何变化时无需记录或通知
+        if not (added_tools or removed_tools or changed_tools):
+            return added_tools, removed_tools
+
+        # 记录并通知更改（新增/移除均相对于本次刷新前的工具列表计算，不会重复）
         if added_tools:
             logger.info(f"新增MCP工具: {added_tools}")
             self.memory.add_message(
@@ -121,9 +131,7 @@ class MCPAgent(ToolCallAgent):
         if removed_tools:
             logger.info(f"移除MCP工具: {removed_tools}")
             self.memory.add_message(
-                Message.system_message(
-                    f"不再可用的工具: {', '.join(removed_tools)}"
-                )
+                Message.system_message(f"不再可用的工具: {', '.join(removed_tools)}")
             )
         if changed_tools:
             logger.info(f"更改的MCP工具: {changed_tools}")
@@ -1,4 +1,10 @@
-from typing import Dict, List, Optional, Union
+import asyncio
+import hashlib
+import json
+import re
+from typing import ClassVar, Dict, List, Optional, Union
+
+import aiofiles
 from pydantic import Field
 
 from app.agent.toolcall import ToolCallAgent
@@ -11,7 +17,55 @@ from app.tool.wireframe_to_html import WireframeToHTML
 from app.tool.html_to_api_doc import HTMLToAPIDoc
 from app.tool.html_to_vue import HTMLToVue
 from app.tool.html_to_springboot import HTMLToSpringboot
-from app.prompt.pipeline import NEXT_STEP_PROMPT, SYSTEM_PROMPT
+from app.prompt.pipeline import NEXT_STEP_PROMPT, PIPELINE_STATUS_PROMPT, SYSTEM_PROMPT
+
+
+# 预先格式化的系统提示语
+_SYSTEM_PROMPT = SYSTEM_PROMPT.format(directory=config.workspace_root)
+
+# 状态提示语在占位符处预先拆分，每步直接拼接而无需解析格式串
+_STATUS_PREFIX, _STATUS_SUFFIX = PIPELINE_STATUS_PROMPT.split("{pipeline_status}")
+
+# 从工具输出中提取保存路径（取最后一个“保存到:”之后的第一行）
+_SAVED_MARKER = "保存到:"
+_SAVED_RE = re.compile(_SAVED_MARKER + r"\s*([^\n]+)")
+
+# 工作流步骤与输出路径键的对应关系
+_STEP_TO_KEY = {
+    "html_creation": "html_path",
+    "api_doc_generation": "api_doc_path",
+    "frontend_generation": "frontend_path",
+    "backend_generation": "backend_path",
+}
+
+# 运行结束时的执行结果摘要模板
+_SUMMARY_TPL = """
+Pipeline执行完成! 状态: {status}
+
+生成的资源:
+- 线框图描述: {wireframe_desc}
+- HTML原型: {html_path}
+- API文档: {api_doc_path}
+- 前端项目: {frontend_path}
+- 后端项目: {backend_path}
+
+项目配置:
+- 项目名称: {project_name}
+- 后端包名: {package_name}
+- 使用项目描述: {uses_description}
+        """
+
+# 摘要中未生成时显示“未生成”的资源项
+_SUMMARY_RESOURCE_KEYS = ("wireframe_desc", "html_path", "api_doc_path", "frontend_path", "backend_path")
+
+# 工具结果缓存目录，以工具名和参数的哈希为键
+_CACHE_DIR = config.workspace_root / ".pipeline_cache"
+
+# 终止工具名称，导入时计算一次
+_TERMINATE_NAME = Terminate().name
+
+# 工具输出中的失败标记，一次扫描完成判断
+_FAIL_RE = re.compile("Error:|错误:|失败:")
 
 
 class PipelineAgent(ToolCallAgent):
@@ -24,7 +78,7 @@ class PipelineAgent(ToolCallAgent):
     name: str = "pipeline_agent"
     description: str = "自动化执行从UI设计到代码生成的端到端流程"
 
-    system_prompt: str = SYSTEM_PROMPT.format(directory=config.workspace_root)
+    system_prompt: str = _SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_PROMPT
 
     # 可用工具集合
@@ -39,16 +93,36 @@ class PipelineAgent(ToolCallAgent):
         )
     )
 
+    # 工具名称与工作流步骤的对应关系
+    _TOOL_TO_STEP: ClassVar[Dict[str, str]] = {
+        "wireframe_generator": "wireframe_generation",
+        "wireframe_html": "html_creation",
+        "html_to_api_doc": "api_doc_generation",
+        "html_to_vue": "frontend_generation",
+        "html_to_springboot": "backend_generation",
+    }
+
     # 特殊工具名称列表
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: List[str] = Field(default_factory=lambda: [_TERMINATE_NAME])
 
     # 工作流程状态跟踪
     pipeline_status: Dict[str, Union[str, Dict]] = Field(default_factory=dict)
     output_files: Dict[str, str] = Field(default_factory=dict)
 
+    # 各状态的步骤计数，用于增量计算整体状态
+    _n_steps: int = 0
+    _n_completed: int = 0
+    _n_failed: int = 0
+
     # 最大步骤数限制
     max_steps: int = 30
 
+    # 是否对工作流工具的结果启用精确匹配缓存（相同工具和参数直接复用上次的成功结果）
+    use_exact_cache: bool = False
+
+    # 批量运行时同时执行的Pipeline数量上限
+    max_concurrency: int = 4
+
     async def initialize(self, input_image_path: Optional[str] = None, project_name: Optional[str] = None, description_text: Optional[str] = None, package_name: Optional[str] = "com.demo"):
         """
         初始化Pipeline代理
@@ -68,6 +142,9 @@ class PipelineAgent(ToolCallAgent):
             "backend_generation": "pending",
             "status": "initialized"
         }
+        self._n_steps = len(self.pipeline_status) - 1
+        self._n_completed = 0
+        self._n_failed = 0
 
         # 存储输出文件路径
         self.output_files = {
@@ -102,10 +179,11 @@ class PipelineAgent(ToolCallAgent):
 
     async def think(self) -> bool:
         """处理当前状态并决定下一步行动"""
-        # 更新提示信息中的工作流状态
+        # 将动态的工作流状态并入本步的下一步提示语，每步只追加一条用户消息；
+        # 静态提示在前、动态状态在后，使每步请求的前缀保持一致
         status_text = "\n".join([f"{step}: {status}" for step, status in self.pipeline_status.items() if step != "status"])
-        self.next_step_prompt = NEXT_STEP_PROMPT.format(
-            pipeline_status=status_text
+        self.next_step_prompt = (
+            NEXT_STEP_PROMPT + "\n" + _STATUS_PREFIX + status_text + _STATUS_SUFFIX
         )
 
         # 调用父类的think方法继续处理
@@ -121,41 +199,27 @@ class PipelineAgent(ToolCallAgent):
             output: 可选的输出信息
         """
         if step in self.pipeline_status:
+            # 按状态迁移增量维护计数
+            previous = self.pipeline_status[step]
+            if step != "status" and previous != status:
+                self._n_completed += (status == "completed") - (previous == "completed")
+                self._n_failed += (status == "failed") - (previous == "failed")
             self.pipeline_status[step] = status
 
-            if output and step in ["wireframe_generation", "html_creation", "api_doc_generation",
-                                 "frontend_generation", "backend_generation"]:
-                # 根据步骤存储相应的输出路径
+            if output:
+                # 根据步骤存储相应的输出内容或路径
                 if step == "wireframe_generation":
                     self.output_files["wireframe_desc"] = output
-                elif step == "html_creation":
-                    # 从输出中提取HTML文件路径
-                    if "保存到:" in output:
-                        html_path = output.split("保存到:")[-1].strip()
-                        self.output_files["html_path"] = html_path
-                elif step == "api_doc_generation":
-                    # 从输出中提取API文档路径
-                    if "保存到:" in output:
-                        api_doc_path = output.split("保存到:")[-1].strip()
-                        self.output_files["api_doc_path"] = api_doc_path
-                elif step == "frontend_generation":
-                    # 从输出中提取前端项目路径
-                    if "保存到:" in output:
-                        frontend_path = output.split("保存到:")[-1].strip().split("\n")[0]
-                        self.output_files["frontend_path"] = frontend_path
-                elif step == "backend_generation":
-                    # 从输出中提取后端项目路径
-                    if "保存到:" in output:
-                        backend_path = output.split("保存到:")[-1].strip().split("\n")[0]
-                        self.output_files["backend_path"] = backend_path
+                elif step in _STEP_TO_KEY:
+                    pos = output.rfind(_SAVED_MARKER)
+                    m = _SAVED_RE.match(output, pos) if pos >= 0 else None
+                    if m:
+                        self.output_files[_STEP_TO_KEY[step]] = m.group(1).strip()
 
         # 更新整体状态
-        all_completed = all(status == "completed" for key, status in self.pipeline_status.items()
-                           if key != "status")
-        if all_completed:
+        if self._n_completed == self._n_steps:
             self.pipeline_status["status"] = "completed"
-        elif any(status == "failed" for key, status in self.pipeline_status.items()
-                if key != "status"):
+        elif self._n_failed:
             self.pipeline_status["status"] = "failed"
         else:
             self.pipeline_status["status"] = "in_progress"
@@ -180,37 +244,54 @@ class PipelineAgent(ToolCallAgent):
                 logger.info(f"自动为html_to_springboot添加package_name参数: {self.output_files['package_name']}")
 
         # 根据工具名称更新对应步骤状态为进行中
-        if tool_name == "wireframe_generator":
-            await self.update_pipeline_status("wireframe_generation", "in_progress")
-        elif tool_name == "wireframe_html":
-            await self.update_pipeline_status("html_creation", "in_progress")
-        elif tool_name == "html_to_api_doc":
-            await self.update_pipeline_status("api_doc_generation", "in_progress")
-        elif tool_name == "html_to_vue":
-            await self.update_pipeline_status("frontend_generation", "in_progress")
-        elif tool_name == "html_to_springboot":
-            await self.update_pipeline_status("backend_generation", "in_progress")
-
-        # 执行工具
-        result = await super().execute_tool(command)
+        step = self._TOOL_TO_STEP.get(tool_name)
+        if step:
+            await self.update_pipeline_status(step, "in_progress")
+
+        # 执行工具（命中缓存时直接复用结果）
+        cache_key = None
+        if step and self.use_exact_cache:
+            cache_key = self._cache_key(tool_name, command.function.arguments)
+        result = await self._read_cached_result(cache_key) if cache_key else None
+        if result is None:
+            result = await super().execute_tool(command)
+            if cache_key and not _FAIL_RE.search(result):
+                await self._write_cached_result(cache_key, result)
+        else:
+            logger.info(f"工具 {tool_name} 命中结果缓存")
 
         # 根据工具名称更新对应步骤状态
-        success = "Error:" not in result and "错误:" not in result and "失败:" not in result
-        status = "completed" if success else "failed"
-
-        if tool_name == "wireframe_generator":
-            await self.update_pipeline_status("wireframe_generation", status, result)
-        elif tool_name == "wireframe_html":
-            await self.update_pipeline_status("html_creation", status, result)
-        elif tool_name == "html_to_api_doc":
-            await self.update_pipeline_status("api_doc_generation", status, result)
-        elif tool_name == "html_to_vue":
-            await self.update_pipeline_status("frontend_generation", status, result)
-        elif tool_name == "html_to_springboot":
-            await self.update_pipeline_status("backend_generation", status, result)
+        if step:
+            status = "failed" if _FAIL_RE.search(result) else "completed"
+            await self.update_pipeline_status(step, status, result)
 
         return result
 
+    @staticmethod
+    def _cache_key(tool_name: str, arguments: str) -> str:
+        """根据工具名称和规范化后的参数计算缓存键"""
+        try:
+            arguments = json.dumps(json.loads(arguments or "{}"), sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            pass
+        return hashlib.blake2b(f"{tool_name}|{arguments}".encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    async def _read_cached_result(key: str) -> Optional[str]:
+        """读取缓存的工具结果，未命中时返回None"""
+        path = _CACHE_DIR / f"{key}.txt"
+        if not path.exists():
+            return None
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            return await f.read()
+
+    @staticmethod
+    async def _write_cached_result(key: str, result: str) -> None:
+        """将工具结果写入缓存"""
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(_CACHE_DIR / f"{key}.txt", "w", encoding="utf-8") as f:
+            await f.write(result)
+
     async def run(self, input_image_path: Optional[str] = None, project_name: Optional[str] = None, description_text: Optional[str] = None, package_name: Optional[str] = "com.demo") -> str:
         """
         运行Pipeline代理
@@ -231,20 +312,37 @@ class PipelineAgent(ToolCallAgent):
         result = await super().run()
 
         # 返回执行结果摘要
-        summary = f"""
-Pipeline执行完成! 状态: {self.pipeline_status['status']}
+        params = {key: self.output_files.get(key, "未生成") for key in _SUMMARY_RESOURCE_KEYS}
+        params.update(
+            status=self.pipeline_status["status"],
+            project_name=self.output_files.get("project_name"),
+            package_name=self.output_files.get("package_name"),
+            uses_description="是" if self.output_files.get("description_text") else "否",
+        )
+        return _SUMMARY_TPL.format_map(params)
 
-生成的资源:
-- 线框图描述: {self.output_files.get('wireframe_desc', '未生成')}
-- HTML原型: {self.output_files.get('html_path', '未生成')}
-- API文档: {self.output_files.get('api_doc_path', '未生成')}
-- 前端项目: {self.output_files.get('frontend_path', '未生成')}
-- 后端项目: {self.output_files.get('backend_path', '未生成')}
+    async def run_batch_async(self, inputs: List[Dict]) -> List[str]:
+        """
+        并发运行多个Pipeline任务
 
-项目配置:
-- 项目名称: {self.output_files.get('project_name')}
-- 后端包名: {self.output_files.get('package_name')}
-- 使用项目描述: {'是' if self.output_files.get('description_text') else '否'}
+        每个任务使用独立的代理实例（独立的记忆、状态和工具），共享同一LLM客户端，
+        并通过信号量限制同时运行的数量。
+
+        参数:
+            inputs: 每项为传给run()的关键字参数字典
+
+        返回:
+            与inputs顺序一致的执行结果摘要列表
         """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run_one(kwargs: Dict) -> str:
+            async with semaphore:
+                agent = self.__class__(llm=self.llm, max_steps=self.max_steps)
+                return await agent.run(**kwargs)
+
+        return list(await asyncio.gather(*(_run_one(kwargs) for kwargs in inputs)))
 
-        return summary
+    def run_batch(self, inputs: List[Dict]) -> List[str]:
+        """run_batch_async的同步入口"""
+        return asyncio.run(self.run_batch_async(inputs))
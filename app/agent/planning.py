@@ -1,3 +1,4 @@
+import re
 import time
 from typing import Dict, List, Optional
 
@@ -10,6 +11,18 @@ from app.schema import TOOL_CHOICE_TYPE, Message, ToolCall, ToolChoice
 from app.tool import PlanningTool, Terminate, ToolCollection
 
 
+# 终止工具名称，导入时计算一次
+_TERMINATE_NAME = Terminate().name
+
+# 计划文本中的“Steps:”标题行，以及未开始/进行中的步骤标记
+_STEPS_HEADER_RE = re.compile(r"^[ \t]*Steps:[ \t]*$", re.M)
+_ACTIVE_RE = re.compile(r"\[[ →]\]")
+
+_MAX_TRACKED_STEPS = 64  # 步骤跟踪记录的最大条数
+_TRACKED_RESULT_CHARS = 256  # 跟踪记录中保留的结果长度，完整结果已在记忆中
+_LOG_PREVIEW_CHARS = 512  # 日志中规划结果的最大预览长度
+
+
 class PlanningAgent(ToolCallAgent):
     """
     规划代理类，用于创建和管理任务解决方案的计划。
@@ -27,7 +40,7 @@ class PlanningAgent(ToolCallAgent):
         default_factory=lambda: ToolCollection(PlanningTool(), Terminate())
     )  # 可用工具集合，默认包含规划工具和终止工具
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # 工具选择类型
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])  # 特殊工具名称列表
+    special_tool_names: List[str] = Field(default_factory=lambda: [_TERMINATE_NAME])  # 特殊工具名称列表
 
     tool_calls: List[ToolCall] = Field(default_factory=list)  # 工具调用列表
     active_plan_id: Optional[str] = Field(default=None)  # 当前活跃计划的 ID
@@ -38,6 +51,8 @@ class PlanningAgent(ToolCallAgent):
 
     max_steps: int = 20  # 最大步骤数
 
+    _plan_msg: Optional[Message] = None  # 上一步带计划状态的用户消息，内容不变时复用
+
     @model_validator(mode="after")
     def initialize_plan_and_verify_tools(self) -> "PlanningAgent":
         """初始化代理，设置默认计划 ID 并验证所需工具。"""
@@ -50,16 +65,22 @@ class PlanningAgent(ToolCallAgent):
 
     async def think(self) -> bool:
         """基于计划状态决定下一个动作。"""
+        # 每步只获取一次计划，同时用于提示语和当前步骤索引
+        plan_text = await self.get_plan() if self.active_plan_id else None
+
         # 根据是否有活跃计划生成提示语
         prompt = (
-            f"CURRENT PLAN STATUS:\n{await self.get_plan()}\n\n{self.next_step_prompt}"
+            f"CURRENT PLAN STATUS:\n{plan_text}\n\n{self.next_step_prompt}"
             if self.active_plan_id
             else self.next_step_prompt
         )
-        self.messages.append(Message.user_message(prompt))  # 添加用户消息
+        # 计划与提示语均未变化时复用上一步的消息实例
+        if self._plan_msg is None or self._plan_msg.content != prompt:
+            self._plan_msg = Message.user_message(prompt)
+        self.messages.append(self._plan_msg)  # 添加用户消息
 
         # 在思考前获取当前步骤索引
-        self.current_step_index = await self._get_current_step_index()
+        self.current_step_index = await self._get_current_step_index(plan_text)
 
         result = await super().think()  # 调用父类的思考方法
 
@@ -68,7 +89,7 @@ class PlanningAgent(ToolCallAgent):
             latest_tool_call = self.tool_calls[0]  # 获取最新的工具调用
             if (
                 latest_tool_call.function.name!= "planning"
-                and latest_tool_call.function.name not in self.special_tool_names
+                and not self._is_special_tool(latest_tool_call.function.name)
                 and self.current_step_index is not None
             ):
                 self.step_execution_tracker[latest_tool_call.id] = {
@@ -76,6 +97,9 @@ class PlanningAgent(ToolCallAgent):
                     "tool_name": latest_tool_call.function.name,
                     "status": "pending",  # 执行后更新状态
                 }
+                # 超出上限时丢弃最早的记录
+                while len(self.step_execution_tracker) > _MAX_TRACKED_STEPS:
+                    del self.step_execution_tracker[next(iter(self.step_execution_tracker))]
 
         return result
 
@@ -90,15 +114,18 @@ class PlanningAgent(ToolCallAgent):
             # 更新执行状态为已完成
             if latest_tool_call.id in self.step_execution_tracker:
                 self.step_execution_tracker[latest_tool_call.id]["status"] = "completed"
-                self.step_execution_tracker[latest_tool_call.id]["result"] = result
+                self.step_execution_tracker[latest_tool_call.id]["result"] = result[:_TRACKED_RESULT_CHARS]
 
                 # 如果是非规划、非特殊工具，更新计划状态
                 if (
                     latest_tool_call.function.name!= "planning"
-                    and latest_tool_call.function.name not in self.special_tool_names
+                    and not self._is_special_tool(latest_tool_call.function.name)
                 ):
                     await self.update_plan_status(latest_tool_call.id)
 
+                # 步骤已在计划中标记完成，跟踪记录不再需要
+                del self.step_execution_tracker[latest_tool_call.id]
+
         return result
 
     async def get_plan(self) -> str:
@@ -127,12 +154,12 @@ class PlanningAgent(ToolCallAgent):
             return
 
         if tool_call_id not in self.step_execution_tracker:
-            logger.warning(f"No step tracking found for tool call {tool_call_id}")  # 没有步骤跟踪时的警告
+            logger.warning("No step tracking found for tool call {}", tool_call_id)  # 没有步骤跟踪时的警告
             return
 
         tracker = self.step_execution_tracker[tool_call_id]
         if tracker["status"]!= "completed":
-            logger.warning(f"Tool call {tool_call_id} has not completed successfully")  # 工具调用未完成时的警告
+            logger.warning("Tool call {} has not completed successfully", tool_call_id)  # 工具调用未完成时的警告
             return
 
         step_index = tracker["step_index"]
@@ -149,57 +176,54 @@ class PlanningAgent(ToolCallAgent):
                 },
             )
             logger.info(
-                f"Marked step {step_index} as completed in plan {self.active_plan_id}"  # 标记步骤完成的信息
-            )
+                "Marked step {} as completed in plan {}", step_index, self.active_plan_id
+            )  # 标记步骤完成的信息
         except Exception as e:
             logger.warning(f"Failed to update plan status: {e}")  # 更新计划状态失败时的警告
 
-    async def _get_current_step_index(self) -> Optional[int]:
+    async def _get_current_step_index(self, plan: Optional[str] = None) -> Optional[int]:
         """
         解析当前计划以确定第一个未完成步骤的索引。
+        可传入本步已获取的计划文本以避免重复获取。
         如果没有找到活跃步骤，则返回 None。
         """
         if not self.active_plan_id:
             return None
 
-        plan = await self.get_plan()
+        if plan is None:
+            plan = await self.get_plan()
 
         try:
-            plan_lines = plan.splitlines()
-            steps_index = -1
-
-            # 查找“Steps:”行的索引
-            for i, line in enumerate(plan_lines):
-                if line.strip() == "Steps:":
-                    steps_index = i
-                    break
-
-            if steps_index == -1:
+            # 查找“Steps:”行的位置
+            header = _STEPS_HEADER_RE.search(plan)
+            if not header:
                 return None
+            steps_start = header.end() + 1
 
-            # 查找第一个未完成的步骤
-            for i, line in enumerate(plan_lines[steps_index + 1:], start=0):
-                if "[ ]" in line or "[→]" in line:  # 未开始或在进行中
-                    # 将当前步骤标记为进行中
-                    await self.available_tools.execute(
-                        name="planning",
-                        tool_input={
-                            "command": "mark_step",
-                            "plan_id": self.active_plan_id,
-                            "step_index": i,
-                            "step_status": "in_progress",
-                        },
-                    )
-                    return i
-
-            return None  # 没有找到活跃步骤
+            # 查找第一个未开始或进行中的步骤，按其之前的换行数确定步骤索引
+            active = _ACTIVE_RE.search(plan, steps_start)
+            if not active:
+                return None  # 没有找到活跃步骤
+            i = plan.count("\n", steps_start, active.start())
+
+            # 将当前步骤标记为进行中
+            await self.available_tools.execute(
+                name="planning",
+                tool_input={
+                    "command": "mark_step",
+                    "plan_id": self.active_plan_id,
+                    "step_index": i,
+                    "step_status": "in_progress",
+                },
+            )
+            return i
         except Exception as e:
             logger.warning(f"Error finding current step index: {e}")  # 查找当前步骤索引出错时的警告
             return None
 
     async def create_initial_plan(self, request: str) -> None:
         """基于请求创建初始计划。"""
-        logger.info(f"Creating initial plan with ID: {self.active_plan_id}")  # 创建初始计划的信息
+        logger.info("Creating initial plan with ID: {}", self.active_plan_id)  # 创建初始计划的信息
 
         messages = [
             Message.user_message(
@@ -210,7 +234,7 @@ class PlanningAgent(ToolCallAgent):
         response = await self.llm.ask_tool(
             messages=messages,
             system_msgs=[Message.system_message(self.system_prompt)],
-            tools=self.available_tools.to_params(),
+            tools=self._get_tool_params(),
             tool_choice=ToolChoice.AUTO,
         )
         assistant_msg = Message.from_tool_calls(
@@ -223,9 +247,11 @@ class PlanningAgent(ToolCallAgent):
         for tool_call in response.tool_calls:
             if tool_call.function.name == "planning":
                 result = await self.execute_tool(tool_call)
-                logger.info(
-                    f"Executed tool {tool_call.function.name} with result: {result}"  # 执行规划工具的信息
-                )
+                logger.opt(lazy=True).info(
+                    "Executed tool {} with result: {}",
+                    lambda: tool_call.function.name,
+                    lambda: result[:_LOG_PREVIEW_CHARS],
+                )  # 执行规划工具的信息
 
                 # 将工具响应添加到内存
                 tool_msg = Message.tool_message(
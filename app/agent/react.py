@@ -7,6 +7,7 @@ from app.agent.base import BaseAgent  # 导入基础代理类
 from app.llm import LLM  # 导入大型语言模型类
 from app.schema import AgentState, Memory  # 导入代理状态和记忆类
 
+
 class ReActAgent(BaseAgent, ABC):  # 定义ReActAgent类，继承自BaseAgent和ABC
     name: str  # 代理名称
     description: Optional[str] = None  # 代理描述，可选
@@ -21,6 +22,9 @@ class ReActAgent(BaseAgent, ABC):  # 定义ReActAgent类，继承自BaseAgent和
     max_steps: int = 10  # 最大步骤数
     current_step: int = 0  # 当前步骤数
 
+    max_context_tokens: Optional[int] = None  # 发送给LLM的上下文令牌预算，None表示不限制
+    keep_recent_messages: int = 6  # 裁剪上下文时原样保留的最近消息数
+
     @abstractmethod  # 定义抽象方法think，子类必须实现
     async def think(self) -> bool:
         """处理当前状态并决定下一步行动"""
@@ -1,12 +1,21 @@
-from typing import List
+import json
+import os
+import re
+from typing import List, Optional
 
 from pydantic import Field
 
 from app.agent.toolcall import ToolCallAgent
 from app.prompt.swe import NEXT_STEP_TEMPLATE, SYSTEM_PROMPT
+from app.schema import ToolCall
 from app.tool import Bash, StrReplaceEditor, Terminate, ToolCollection
 
 
+_BASH_TOOL_NAME = Bash().name  # Bash 工具名称
+_TERMINATE_NAME = Terminate().name  # 终止工具名称
+_CD_RE = re.compile(r"\s*cd\s+(\S+)")  # 匹配以 cd 开头的命令及其目标目录
+
+
 class SWEAgent(ToolCallAgent):
     """一个实现了SWEAgent范式的代理，用于执行代码和自然对话。"""
 
@@ -14,25 +23,46 @@ class SWEAgent(ToolCallAgent):
     description: str = "一个自主的AI程序员，直接与计算机交互以解决问题。"  # 代理的描述
 
     system_prompt: str = SYSTEM_PROMPT  # 系统提示信息
-    next_step_prompt: str = NEXT_STEP_TEMPLATE  # 下一步提示模板
+    next_step_prompt: str = NEXT_STEP_TEMPLATE  # 下一步提示（由模板渲染）
+    next_step_template: str = NEXT_STEP_TEMPLATE  # 下一步提示模板，保持不变
 
     available_tools: ToolCollection = ToolCollection(
         Bash(), StrReplaceEditor(), Terminate()  # 可用的工具集合，包括Bash命令执行、字符串替换编辑器和终止工具
     )
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])  # 特殊工具名称列表，默认包含终止工具的名称
+    special_tool_names: List[str] = Field(default_factory=lambda: [_TERMINATE_NAME])  # 特殊工具名称列表，默认包含终止工具的名称
 
     max_steps: int = 30  # 最大执行步骤数
 
     bash: Bash = Field(default_factory=Bash)  # Bash工具实例
-    working_dir: str = "."  # 当前工作目录，默认为当前目录
+    working_dir: str = Field(default_factory=os.getcwd)  # 当前工作目录，bash 会话启动时的目录
+
+    _rendered_dir: Optional[str] = None  # 上次渲染下一步提示时使用的工作目录
+
+    async def execute_tool(self, command: ToolCall) -> str:
+        """执行工具调用，并根据 bash 中的 cd 命令跟踪工作目录，无需每步执行 pwd"""
+        result = await super().execute_tool(command)
+
+        if command and command.function and command.function.name == _BASH_TOOL_NAME:
+            try:
+                cmd = json.loads(command.function.arguments or "{}").get("command") or ""
+            except (json.JSONDecodeError, AttributeError):
+                cmd = ""
+            match = _CD_RE.match(cmd)
+            if match:
+                target = os.path.expanduser(match.group(1).strip("'\""))
+                new_dir = os.path.normpath(os.path.join(self.working_dir, target))
+                if os.path.isdir(new_dir):
+                    self.working_dir = new_dir
+
+        return result
 
     async def think(self) -> bool:
         """处理当前状态并决定下一步行动"""
-        # 更新工作目录
-        result = await self.bash.execute("pwd")  # 执行pwd命令获取当前工作目录
-        self.working_dir = result.output  # 更新当前工作目录
-        self.next_step_prompt = self.next_step_prompt.format(
-            current_dir=self.working_dir  # 更新下一步提示模板中的当前目录
-        )
+        # 从模板渲染下一步提示，仅在工作目录变化时重新渲染
+        if self._rendered_dir != self.working_dir:
+            self.next_step_prompt = self.next_step_template.format(
+                current_dir=self.working_dir  # 更新下一步提示模板中的当前目录
+            )
+            self._rendered_dir = self.working_dir
 
         return await super().think()  # 调用父类的think方法，继续处理下一步行动
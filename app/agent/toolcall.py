@@ -1,5 +1,9 @@
+import asyncio
+import hashlib
 import json
-from typing import Any, List, Optional, Union
+from contextvars import ContextVar
+from functools import cached_property
+from typing import Any, List, Optional, Tuple, Union
 
 from pydantic import Field
 
@@ -15,9 +19,18 @@ from app.schema import (
     ToolChoice,  # 工具选择类
 )
 from app.tool import CreateChatCompletion, Terminate, ToolCollection  # 导入工具类
+from app.utils.json import loads as _json_loads  # 解析较大的工具参数（文件内容、代码片段）
 
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"  # 工具调用必需但未提供的错误信息
+_TERMINATE_NAME = Terminate().name  # 终止工具名称，导入时计算一次
+_ELIDED_OBSERVATION = "[earlier tool output omitted to fit the context budget]"  # 被裁剪的工具输出占位内容
+_LOG_PREVIEW_CHARS = 512  # 日志中工具参数与结果的最大预览长度
+
+# 当前工具调用产生的 base64 图像；每个并发执行的工具调用拥有独立的上下文，互不覆盖
+_current_base64_image: ContextVar[Optional[str]] = ContextVar(
+    "current_base64_image", default=None
+)
 
 
 class ToolCallAgent(ReActAgent):
@@ -33,33 +46,44 @@ class ToolCallAgent(ReActAgent):
         CreateChatCompletion(), Terminate()
     )  # 可用工具集合
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # 工具选择模式，默认自动
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])  # 特殊工具名称列表
+    special_tool_names: List[str] = Field(default_factory=lambda: [_TERMINATE_NAME])  # 特殊工具名称列表
 
     tool_calls: List[ToolCall] = Field(default_factory=list)  # 工具调用列表
-    _current_base64_image: Optional[str] = None  # 当前 base64 图像，用于特殊工具
+    _tool_params_cache: Optional[List[dict]] = None  # 缓存的工具参数定义
+    _tool_params_src: Optional[tuple] = None  # 生成缓存时的工具元组，工具集合变化时缓存失效
+    _prompt_cache_memo: Optional[tuple] = None  # (系统提示语, 工具参数, 缓存参数) 的缓存
+    _tool_params_json_memo: Optional[tuple] = None  # (工具参数, 其规范化 JSON) 的缓存
 
     max_steps: int = 30  # 最大步骤数
     max_observe: Optional[Union[int, bool]] = None  # 最大观察次数或是否观察
+    parallel_tools: bool = False  # 同一轮中的多个工具调用是否并发执行；默认按顺序执行，仅在工具互不依赖时由子类开启
+
+    _next_step_msg: Optional[Message] = None  # 下一步提示对应的用户消息，提示语不变时复用
 
     async def think(self) -> bool:
         """处理当前状态并使用工具决定下一步行动"""
+        user_msg = None
         if self.next_step_prompt:
-            user_msg = Message.user_message(self.next_step_prompt)  # 创建用户消息
-            self.messages += [user_msg]  # 添加到消息列表
+            user_msg = self._next_step_message()  # 获取（缓存的）用户消息
+            self.messages.append(user_msg)  # 添加到消息列表
+
+        tools = self._get_tool_params()
+
+        # 启用响应缓存时，相同的 (系统提示语, 消息, 工具) 直接复用上次的响应
+        cache = getattr(self.llm, "llm_cache", None)
+        cache_key = self._llm_cache_key() if cache is not None else None
+        response = cache.lookup(cache_key) if cache_key else None
 
         try:
             # 使用工具获取响应
-            response = await self.llm.ask_tool(
-                messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                tools=self.available_tools.to_params(),
-                tool_choice=self.tool_choices,
-            )
+            if response is not None:
+                logger.info("♻️ {} reused a cached LLM response", self.name)
+            else:
+                response = await self._ask_tool(tools)
+                if cache_key and response is not None:
+                    cache.update(cache_key, response)
         except ValueError:
+            self._discard_prompt(user_msg)
             raise
         except Exception as e:
             # 检查是否是包含 TokenLimitExceeded 的 RetryError
@@ -75,6 +99,7 @@ class ToolCallAgent(ReActAgent):
                 )
                 self.state = AgentState.FINISHED  # 设置代理状态为完成
                 return False
+            self._discard_prompt(user_msg)
             raise
 
         self.tool_calls = tool_calls = (
@@ -83,15 +108,18 @@ class ToolCallAgent(ReActAgent):
         content = response.content if response and response.content else ""
 
         # 记录响应信息
-        logger.info(f"✨ {self.name}'s thoughts: {content}")
-        logger.info(
-            f"🛠️ {self.name} selected {len(tool_calls) if tool_calls else 0} tools to use"
-        )
+        # 使用 loguru 的参数格式化，仅在消息实际输出时才拼接；大段内容再通过 lazy 截断
+        logger.info("✨ {}'s thoughts: {}", self.name, content)
+        logger.info("🛠️ {} selected {} tools to use", self.name, len(tool_calls))
         if tool_calls:
-            logger.info(
-                f"🧰 Tools being prepared: {[call.function.name for call in tool_calls]}"
+            logger.opt(lazy=True).info(
+                "🧰 Tools being prepared: {}",
+                lambda: [call.function.name for call in tool_calls],
+            )
+            logger.opt(lazy=True).info(
+                "🔧 Tool arguments: {}",
+                lambda: tool_calls[0].function.arguments[:_LOG_PREVIEW_CHARS],
             )
-            logger.info(f"🔧 Tool arguments: {tool_calls[0].function.arguments}")
 
         try:
             if response is None:
@@ -133,6 +161,103 @@ class ToolCallAgent(ReActAgent):
             )
             return False
 
+    async def _ask_tool(self, tools: List[dict]):
+        """携带系统提示语、工具定义及缓存参数调用 LLM"""
+        return await self.llm.ask_tool(
+            messages=self._compress_messages(self.messages),
+            system_msgs=(
+                [Message.system_message(self.system_prompt)]
+                if self.system_prompt
+                else None
+            ),
+            tools=tools,
+            tool_choice=self.tool_choices,
+            **self._prompt_cache_kwargs(tools),
+        )
+
+    def _llm_cache_key(self) -> str:
+        """由系统提示语、完整消息历史和工具定义计算响应缓存键"""
+        messages_json = json.dumps(
+            [msg.model_dump() for msg in self.messages],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        payload = "|".join(
+            [self.system_prompt or "", messages_json, self._tool_params_json()]
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _compress_messages(self, messages: List[Message]) -> List[Message]:
+        """
+        按令牌预算裁剪发送给 LLM 的上下文，不修改记忆本身。
+        超出 max_context_tokens 时，从最早的消息开始将冗长的工具输出替换为占位内容（保留消息以维持工具调用配对），
+        最近 keep_recent_messages 条消息保持原样。
+        """
+        if not self.max_context_tokens:
+            return messages
+
+        counts = [self.llm.count_tokens(msg.content or "") for msg in messages]
+        total = sum(counts)
+        if total <= self.max_context_tokens:
+            return messages
+
+        elided_tokens = self.llm.count_tokens(_ELIDED_OBSERVATION)
+        compressed = list(messages)
+        for i in range(max(0, len(messages) - self.keep_recent_messages)):
+            if total <= self.max_context_tokens:
+                break
+            msg = compressed[i]
+            if msg.role == "tool" and counts[i] > elided_tokens:
+                compressed[i] = msg.model_copy(
+                    update={"content": _ELIDED_OBSERVATION, "base64_image": None}
+                )
+                total -= counts[i] - elided_tokens
+
+        return compressed
+
+    def _next_step_message(self) -> Message:
+        """返回 next_step_prompt 对应的用户消息；提示语未变化时复用同一实例（消息写入记忆后不会被修改）"""
+        msg = self._next_step_msg
+        if msg is None or msg.content != self.next_step_prompt:
+            msg = self._next_step_msg = Message.user_message(self.next_step_prompt)
+        return msg
+
+    def _discard_prompt(self, user_msg: Optional[Message]) -> None:
+        """LLM 调用失败时移除本步追加的提示消息，避免重试时残留重复提示"""
+        if user_msg is not None and self.messages and self.messages[-1] is user_msg:
+            self.messages.pop()
+
+    def _get_tool_params(self) -> List[dict]:
+        """返回缓存的工具参数定义；添加或替换工具后自动重新生成"""
+        tools = self.available_tools.tools
+        if self._tool_params_cache is None or self._tool_params_src is not tools:
+            self._tool_params_cache = self.available_tools.to_params()
+            self._tool_params_src = tools
+        return self._tool_params_cache
+
+    def _tool_params_json(self) -> str:
+        """工具参数定义的规范化 JSON，随 _get_tool_params 的缓存一起失效"""
+        tools = self._get_tool_params()
+        memo = self._tool_params_json_memo
+        if memo is None or memo[0] is not tools:
+            memo = (tools, json.dumps(tools, sort_keys=True, ensure_ascii=False))
+            self._tool_params_json_memo = memo
+        return memo[1]
+
+    def _prompt_cache_kwargs(self, tools: List[dict]) -> dict:
+        """为支持的后端生成稳定前缀（系统提示语 + 工具定义）的缓存键，使每步请求复用同一前缀缓存"""
+        if not self.llm.supports_prompt_cache_key:
+            return {}
+        memo = self._prompt_cache_memo
+        if memo and memo[0] == self.system_prompt and memo[1] is tools:
+            return memo[2]
+        prefix = (self.system_prompt or "") + self._tool_params_json()
+        key = hashlib.blake2b(prefix.encode(), digest_size=16).hexdigest()
+        kwargs = {"extra_body": {"prompt_cache_key": key}}
+        self._prompt_cache_memo = (self.system_prompt, tools, kwargs)
+        return kwargs
+
     async def act(self) -> str:
         """执行工具调用并处理结果"""
         if not self.tool_calls:
@@ -142,32 +267,50 @@ class ToolCallAgent(ReActAgent):
             # 如果没有工具调用，返回最后一条消息内容
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
-        for command in self.tool_calls:
-            # 为每个工具调用重置 base64_image
-            self._current_base64_image = None
-
-            result = await self.execute_tool(command)  # 执行工具
-
-            if self.max_observe:
-                result = result[: self.max_observe]  # 限制观察结果长度
-
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+        if self.parallel_tools and len(self.tool_calls) > 1:
+            outcomes = await asyncio.gather(
+                *(self._run_one_tool(command) for command in self.tool_calls),
+                return_exceptions=True,
             )
+        else:
+            outcomes = [await self._run_one_tool(command) for command in self.tool_calls]
+
+        # 按原始工具调用顺序写入内存，保持历史记录确定
+        results = []
+        for command, outcome in zip(self.tool_calls, outcomes):
+            if isinstance(outcome, BaseException):
+                result, base64_image = f"Error: {str(outcome)}", None
+            else:
+                result, base64_image = outcome
 
-            # 将工具响应添加到内存
             tool_msg = Message.tool_message(
                 content=result,
                 tool_call_id=command.id,
                 name=command.function.name,
-                base64_image=self._current_base64_image,
+                base64_image=base64_image,
             )
             self.memory.add_message(tool_msg)
             results.append(result)
 
         return "\n\n".join(results)
 
+    async def _run_one_tool(self, command: ToolCall) -> Tuple[str, Optional[str]]:
+        """执行单个工具调用，返回（结果, base64 图像）"""
+        # 为每个工具调用重置 base64_image
+        _current_base64_image.set(None)
+
+        result = await self.execute_tool(command)  # 执行工具
+
+        if self.max_observe:
+            result = result[: self.max_observe]  # 限制观察结果长度
+
+        logger.opt(lazy=True).info(
+            "🎯 Tool '{}' completed its mission! Result: {}",
+            lambda: command.function.name,
+            lambda: result[:_LOG_PREVIEW_CHARS],
+        )
+        return result, _current_base64_image.get()
+
     async def execute_tool(self, command: ToolCall) -> str:
         """执行单个工具调用并处理错误"""
         if not command or not command.function or not command.function.name:
@@ -179,10 +322,10 @@ class ToolCallAgent(ReActAgent):
 
         try:
             # 解析参数
-            args = json.loads(command.function.arguments or "{}")
+            args = _json_loads(command.function.arguments or "{}")
 
             # 执行工具
-            logger.info(f"🔧 Activating tool: '{name}'...")
+            logger.info("🔧 Activating tool: '{}'...", name)
             result = await self.available_tools.execute(name=name, tool_input=args)
 
             # 处理特殊工具
@@ -191,7 +334,7 @@ class ToolCallAgent(ReActAgent):
             # 处理包含 base64_image 的结果
             if hasattr(result, "base64_image") and result.base64_image:
                 # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
+                _current_base64_image.set(result.base64_image)
 
                 # Format result for display
                 observation = (
@@ -209,7 +352,7 @@ class ToolCallAgent(ReActAgent):
             )
 
             return observation
-        except json.JSONDecodeError:
+        except json.JSONDecodeError:  # orjson.JSONDecodeError 也是它的子类
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
                 f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
@@ -227,7 +370,7 @@ class ToolCallAgent(ReActAgent):
 
         if self._should_finish_execution(name=name, result=result, **kwargs):
             # Set agent state to finished
-            logger.info(f"🏁 Special tool '{name}' has completed the task!")
+            logger.info("🏁 Special tool '{}' has completed the task!", name)
             self.state = AgentState.FINISHED  # 设置代理状态为完成
 
     @staticmethod
@@ -235,6 +378,11 @@ class ToolCallAgent(ReActAgent):
         """确定工具执行是否应结束代理"""
         return True
 
+    @cached_property
+    def _special_tool_set(self) -> frozenset:
+        """小写特殊工具名称集合，首次使用时构建"""
+        return frozenset(n.lower() for n in self.special_tool_names)
+
     def _is_special_tool(self, name: str) -> bool:
         """检查工具名称是否在特殊工具列表中"""
-        return name.lower() in [n.lower() for n in self.special_tool_names]
+        return name.lower() in self._special_tool_set
@@ -1,6 +1,7 @@
+import asyncio
 from abc import ABC, abstractmethod  # 导入抽象基类和抽象方法装饰器
 from enum import Enum  # 导入枚举类
-from typing import Dict, List, Optional, Union  # 导入类型提示相关模块
+from typing import Any, Dict, List, Optional, Tuple, Union  # 导入类型提示相关模块
 
 from pydantic import BaseModel  # 导入 Pydantic 的基模型，用于数据验证
 
@@ -18,6 +19,8 @@ class BaseFlow(BaseModel, ABC):
     agents: Dict[str, BaseAgent]  # 存储代理的字典，键为代理名称，值为代理实例
     tools: Optional[List] = None  # 可选的工具列表
     primary_agent_key: Optional[str] = None  # 主代理的键名，默认为 None
+    max_parallel_agents: int = 8  # run_agents_parallel 同时运行的代理数量上限
+    _agent_semaphore: Optional[asyncio.Semaphore] = None  # 限制并行代理数量的信号量，首次并行运行时创建，多次调用共享
 
     class Config:
         arbitrary_types_allowed = True  # 允许任意类型，以支持存储代理实例
@@ -30,20 +33,24 @@ class BaseFlow(BaseModel, ABC):
         :param agents: 单个代理实例、代理实例列表或代理字典
         :param data: 其他初始化数据
         """
+        # 快速路径：已是代理字典且显式指定了主代理，无需再做任何归一化
+        if isinstance(agents, dict) and data.get("primary_agent_key"):
+            data["agents"] = agents
+            super().__init__(**data)
+            return
+
         # 处理不同方式提供的代理
         if isinstance(agents, BaseAgent):
             agents_dict = {"default": agents}  # 单个代理，键名为 "default"
         elif isinstance(agents, list):
             # 列表中的代理，键名为 "agent_0", "agent_1", ...
-            agents_dict = {f"agent_{i}": agent for i, agent in enumerate(agents)}
+            agents_dict = dict(zip((f"agent_{i}" for i in range(len(agents))), agents))
         else:
             agents_dict = agents  # 已经是代理字典
 
         # 如果未指定主代理键名，使用第一个代理的键名
-        primary_key = data.get("primary_agent_key")
-        if not primary_key and agents_dict:
-            primary_key = next(iter(agents_dict))
-            data["primary_agent_key"] = primary_key  # 更新数据字典中的主代理键名
+        if not data.get("primary_agent_key") and agents_dict:
+            data["primary_agent_key"] = next(iter(agents_dict))  # 更新数据字典中的主代理键名
 
         # 设置代理字典到数据中
         data["agents"] = agents_dict
@@ -64,6 +71,26 @@ class BaseFlow(BaseModel, ABC):
         """向流程中添加一个新的代理"""
         self.agents[key] = agent
 
+    async def run_agents_parallel(self, inputs: Dict[str, str]) -> Dict[str, Any]:
+        """
+        并发运行多个相互独立的代理
+        :param inputs: 代理键名到输入文本的映射
+        :return: 代理键名到运行结果的映射；失败的代理对应其抛出的异常
+        """
+        if self._agent_semaphore is None:
+            self._agent_semaphore = asyncio.Semaphore(max(1, self.max_parallel_agents))
+        semaphore = self._agent_semaphore
+
+        async def _run(key: str, text: str) -> str:
+            async with semaphore:
+                return await self.agents[key].run(text)
+
+        keys = list(inputs)
+        results = await asyncio.gather(
+            *(_run(key, inputs[key]) for key in keys), return_exceptions=True
+        )
+        return dict(zip(keys, results))
+
     @abstractmethod
     async def execute(self, input_text: str) -> str:
         """使用给定的输入文本执行流程，需要在子类中实现"""
@@ -79,21 +106,30 @@ class PlanStepStatus(str, Enum):
     BLOCKED = "blocked"  # 阻塞
 
     @classmethod
-    def get_all_statuses(cls) -> list[str]:
+    def get_all_statuses(cls) -> Tuple[str, ...]:
         """获取所有可能的步骤状态值"""
-        return [status.value for status in cls]
+        return _ALL_STATUSES
 
     @classmethod
-    def get_active_statuses(cls) -> list[str]:
+    def get_active_statuses(cls) -> Tuple[str, ...]:
         """获取表示活动状态的值（未开始或进行中）"""
-        return [cls.NOT_STARTED.value, cls.IN_PROGRESS.value]
+        return _ACTIVE_STATUSES
 
     @classmethod
     def get_status_marks(cls) -> Dict[str, str]:
-        """获取状态到其标记符号的映射"""
-        return {
-            cls.COMPLETED.value: "[✓]",  # 已完成标记
-            cls.IN_PROGRESS.value: "[→]",  # 进行中标记
-            cls.BLOCKED.value: "[!]",  # 阻塞标记
-            cls.NOT_STARTED.value: "[ ]",  # 未开始标记
-        }
+        """获取状态到其标记符号的映射（共享的只读表，请勿修改）"""
+        return _STATUS_MARKS
+
+
+# 状态表在类定义时一次性构建；放在枚举体外，避免被 Enum 当作成员
+_ALL_STATUSES: Tuple[str, ...] = tuple(status.value for status in PlanStepStatus)
+_ACTIVE_STATUSES: Tuple[str, ...] = (
+    PlanStepStatus.NOT_STARTED.value,
+    PlanStepStatus.IN_PROGRESS.value,
+)
+_STATUS_MARKS: Dict[str, str] = {
+    PlanStepStatus.COMPLETED.value: "[✓]",  # 已完成标记
+    PlanStepStatus.IN_PROGRESS.value: "[→]",  # 进行中标记
+    PlanStepStatus.BLOCKED.value: "[!]",  # 阻塞标记
+    PlanStepStatus.NOT_STARTED.value: "[ ]",  # 未开始标记
+}
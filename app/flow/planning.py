@@ -1,5 +1,9 @@
+import asyncio
+import hashlib
 import json
+import re
 import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Union
 
 from pydantic import Field
@@ -12,6 +16,62 @@ from app.schema import AgentState, Message, ToolChoice
 from app.tool import PlanningTool
 
 
+_PLAN_TEMPLATE_CACHE_SIZE = 256  # 计划模板缓存的最大条目数
+_PLAN_TEMPLATE_CACHE: "OrderedDict[str, List[str]]" = OrderedDict()  # 规范化请求哈希 -> 计划步骤（LRU）
+_PLAN_TEMPLATE_LOCKS: Dict[str, asyncio.Lock] = {}  # 正在创建计划的请求哈希 -> 锁
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_STEP_TYPE_RE = re.compile(r"\[([A-Z_]+)\]")  # 步骤文本中的类型标记，例如 [SEARCH]
+_TRIVIAL_REQUEST_RE = re.compile(
+    r"^(hi|hello|hey|test|ping|你好|您好|测试)[\s!！.。?？]*$", re.IGNORECASE
+)  # 无需规划的简单请求
+_ACTIVE_STATUSES = frozenset(PlanStepStatus.get_active_statuses())  # 活动状态集合，O(1) 成员判断
+
+
+def _plan_template_key(request: str) -> str:
+    """规范化请求（小写、去标点、合并空白）后计算缓存键"""
+    normalized = _WHITESPACE_RE.sub(" ", _PUNCT_RE.sub("", request.lower())).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def _classify_steps(steps: List[str]) -> List[Optional[str]]:
+    """一次性提取所有步骤文本中的类型标记（小写），没有标记的步骤为 None"""
+    search = _STEP_TYPE_RE.search
+    return [m.group(1).lower() if (m := search(step)) else None for step in steps]
+
+
+class SummaryCache:
+    """已完成计划摘要的内存缓存，键只取计划的稳定部分（步骤文本与状态计数），忽略 ID 与备注"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def make_key(plan_data: dict) -> str:
+        steps = plan_data.get("steps", [])
+        counts: Dict[str, int] = {}
+        for status in plan_data.get("step_statuses", []):
+            counts[status] = counts.get(status, 0) + 1
+        canonical = json.dumps([steps, sorted(counts.items())], ensure_ascii=False)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        summary = self._entries.get(key)
+        if summary is not None:
+            self._entries.move_to_end(key)
+        return summary
+
+    def put(self, key: str, summary: str) -> None:
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_SUMMARY_CACHE = SummaryCache()
+
+
 class PlanningFlow(BaseFlow):
     """规划流程类，用于使用代理管理任务的规划和执行。"""
 
@@ -20,6 +80,11 @@ class PlanningFlow(BaseFlow):
     executor_keys: List[str] = Field(default_factory=list)  # 执行器键的列表
     active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")  # 当前活动计划的 ID
     current_step_index: Optional[int] = None  # 当前步骤的索引
+    trivial_request_chars: int = 0  # 短于该长度的请求直接使用默认计划；0 表示仅匹配问候/测试类请求
+
+    _plan_text_memo: Optional[tuple] = None  # (计划 ID, 计划文本)，流程每次修改计划时清空
+    _default_executor: Optional[BaseAgent] = None  # 没有匹配步骤类型时使用的执行代理
+    _step_types: Optional[tuple] = None  # (步骤列表, 各步骤类型)，步骤列表不变时复用
 
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
@@ -44,22 +109,33 @@ class PlanningFlow(BaseFlow):
         if not self.executor_keys:
             self.executor_keys = list(self.agents.keys())
 
+        self._refresh_default_executor()
+
+    def _refresh_default_executor(self) -> None:
+        """预先确定默认执行代理：第一个可用的执行器，否则回退到主代理"""
+        self._default_executor = next(
+            (self.agents[key] for key in self.executor_keys if key in self.agents),
+            self.primary_agent,
+        )
+
+    def add_agent(self, key: str, agent: BaseAgent) -> None:
+        """添加代理，并更新默认执行代理"""
+        super().add_agent(key, agent)
+        self._refresh_default_executor()
+
     def get_executor(self, step_type: Optional[str] = None) -> BaseAgent:
         """
         获取当前步骤的合适执行代理。
         可以扩展为基于步骤类型/要求选择代理。
         """
         # 如果提供了步骤类型并且与代理键匹配，则使用该代理
-        if step_type and step_type in self.agents:
-            return self.agents[step_type]
+        if step_type:
+            agent = self.agents.get(step_type)
+            if agent is not None:
+                return agent
 
-        # 否则使用第一个可用的执行器或回退到主代理
-        for key in self.executor_keys:
-            if key in self.agents:
-                return self.agents[key]
-
-        # 回退到主代理
-        return self.primary_agent
+        # 否则使用预先确定的默认执行代理
+        return self._default_executor
 
     async def execute(self, input_text: str) -> str:
         """使用代理执行规划流程。"""
@@ -78,6 +154,9 @@ class PlanningFlow(BaseFlow):
                     )
                     return f"为: {input_text} 创建计划失败"
 
+            # 补齐状态与备注列表（仅此一次），此后按步骤索引可直接访问
+            self._normalize_plan()
+
             result = ""
             while True:
                 # 获取要执行的当前步骤
@@ -92,8 +171,7 @@ class PlanningFlow(BaseFlow):
                 step_type = step_info.get("type") if step_info else None
                 executor = self.get_executor(step_type)
                 step_result = await self._execute_step(executor, step_info)
-                result += step_result + "
-"
+                result += step_result + "\n"
 
                 # 检查代理是否想要终止
                 if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
@@ -104,292 +182,355 @@ class PlanningFlow(BaseFlow):
             logger.error(f"Error in PlanningFlow: {str(e)}")
             return f"Execution failed: {str(e)}"
 
-       async def _create_initial_plan(self, request: str) -> None:
-           """根据请求使用流程的LLM和PlanningTool创建初始计划。"""
-           logger.info(f"Creating initial plan with ID: {self.active_plan_id}")  # 记录创建计划的日志信息
-
-           # 创建用于计划创建的系统消息
-           system_message = Message.system_message(
-               "You are a planning assistant. Create a concise, actionable plan with clear steps. "
-               "Focus on key milestones rather than detailed sub-steps. "
-               "Optimize for clarity and efficiency."
-           )
-
-           # 创建包含请求的用户消息
-           user_message = Message.user_message(
-               f"Create a reasonable plan with clear steps to accomplish the task: {request}"
-           )
-
-           # 使用PlanningTool调用LLM
-           response = await self.llm.ask_tool(
-               messages=[user_message],
-               system_msgs=[system_message],
-               tools=[self.planning_tool.to_param()],
-               tool_choice=ToolChoice.AUTO,
-           )
-
-           # 如果存在工具调用，则进行处理
-           if response.tool_calls:
-               for tool_call in response.tool_calls:
-                   if tool_call.function.name == "planning":
-                       # 解析参数
-                       args = tool_call.function.arguments
-                       if isinstance(args, str):
-                           try:
-                               args = json.loads(args)
-                           except json.JSONDecodeError:
-                               logger.error(f"Failed to parse tool arguments: {args}")
-                               continue
-
-                       # 确保plan_id设置正确并执行工具
-                       args["plan_id"] = self.active_plan_id
-
-                       # 通过ToolCollection而不是直接执行工具
-                       result = await self.planning_tool.execute(**args)
-
-                       logger.info(f"Plan creation result: {str(result)}")
-                       return
-
-           # 如果执行到这里，创建默认计划
-           logger.warning("Creating default plan")
-
-           # 使用ToolCollection创建默认计划
-           await self.planning_tool.execute(
-               **{
-                   "command": "create",
-                   "plan_id": self.active_plan_id,
-                   "title": f"Plan for: {request[:50]}{'...' if len(request) > 50 else ''}",
-                   "steps": ["Analyze request", "Execute task", "Verify results"],
-               }
-           )
-
-       async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
-           """
-           解析当前计划以确定第一个未完成步骤的索引和信息。
-           如果没有找到活动步骤，则返回(None, None)。
-           """
-           if (
-               not self.active_plan_id
-               or self.active_plan_id not in self.planning_tool.plans
-           ):
-               logger.error(f"Plan with ID {self.active_plan_id} not found")
-               return None, None
-
-           try:
-               # 直接从规划工具存储中访问计划数据
-               plan_data = self.planning_tool.plans[self.active_plan_id]
-               steps = plan_data.get("steps", [])
-               step_statuses = plan_data.get("step_statuses", [])
-
-               # 查找第一个未完成的步骤
-               for i, step in enumerate(steps):
-                   if i >= len(step_statuses):
-                       status = PlanStepStatus.NOT_STARTED.value
-                   else:
-                       status = step_statuses[i]
-
-                   if status in PlanStepStatus.get_active_statuses():
-                       # 如果可用，提取步骤类型/类别
-                       step_info = {"text": step}
-
-                       # 尝试从文本中提取步骤类型（例如[SEARCH]或[CODE]）
-                       import re
-
-                       type_match = re.search(r"\[([A-Z_]+)\]", step)
-                       if type_match:
-                           step_info["type"] = type_match.group(1).lower()
-
-                       # 将当前步骤标记为进行中
-                       try:
-                           await self.planning_tool.execute(
-                               command="mark_step",
-                               plan_id=self.active_plan_id,
-                               step_index=i,
-                               step_status=PlanStepStatus.IN_PROGRESS.value,
-                           )
-                       except Exception as e:
-                           logger.warning(f"Error marking step as in_progress: {e}")
-                           # 如果需要，直接更新步骤状态
-                           if i < len(step_statuses):
-                               step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
-                           else:
-                               while len(step_statuses) < i:
-                                   step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                               step_statuses.append(PlanStepStatus.IN_PROGRESS.value)
-
-                           plan_data["step_statuses"] = step_statuses
-
-                       return i, step_info
-
-               return None, None  # 没有找到活动步骤
-
-           except Exception as e:
-               logger.warning(f"Error finding current step index: {e}")
-               return None, None
-
-       async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-           """使用指定的代理执行当前步骤。"""
-           # 为代理准备带有当前计划状态的上下文
-           plan_status = await self._get_plan_text()
-           step_text = step_info.get("text", f"Step {self.current_step_index}")
-
-           # 创建一个提示，供代理执行当前步骤
-           step_prompt = f"""
-           CURRENT PLAN STATUS:
-           {plan_status}
-
-           YOUR CURRENT TASK:
-           You are now working on step {self.current_step_index}: "{step_text}"
-
-           Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
-           """
-
-           # 使用agent.run()执行步骤
-           try:
-               step_result = await executor.run(step_prompt)
-
-               # 成功执行后，将步骤标记为已完成
-               await self._mark_step_completed()
-
-               return step_result
-           except Exception as e:
-               logger.error(f"Error executing step {self.current_step_index}: {e}")
-               return f"Error executing step {self.current_step_index}: {str(e)}"
-
-       async def _mark_step_completed(self) -> None:
-           """将当前步骤标记为已完成。"""
-           if self.current_step_index is None:
-               return
-
-           try:
-               # 将步骤标记为已完成
-               await self.planning_tool.execute(
-                   command="mark_step",
-                   plan_id=self.active_plan_id,
-                   step_index=self.current_step_index,
-                   step_status=PlanStepStatus.COMPLETED.value,
-               )
-               logger.info(
-                   f"Marked step {self.current_step_index} as completed in plan {self.active_plan_id}"
-               )
-           except Exception as e:
-               logger.warning(f"Failed to update plan status: {e}")
-               # 如果需要，直接在规划工具存储中更新步骤状态
-               if self.active_plan_id in self.planning_tool.plans:
-                   plan_data = self.planning_tool.plans[self.active_plan_id]
-                   step_statuses = plan_data.get("step_statuses", [])
-
-                   # 确保step_statuses列表足够长
-                   while len(step_statuses) <= self.current_step_index:
-                       step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-
-                   # 更新状态
-                   step_statuses[self.current_step_index] = PlanStepStatus.COMPLETED.value
-                   plan_data["step_statuses"] = step_statuses
-
-       async def _get_plan_text(self) -> str:
-           """获取当前计划的格式化文本。"""
-           try:
-               result = await self.planning_tool.execute(
-                   command="get", plan_id=self.active_plan_id
-               )
-               return result.output if hasattr(result, "output") else str(result)
-           except Exception as e:
-               logger.error(f"Error getting plan: {e}")
-               return self._generate_plan_text_from_storage()
-
-       def _generate_plan_text_from_storage(self) -> str:
-           """如果规划工具失败，则直接从存储中生成计划文本。"""
-           try:
-               if self.active_plan_id not in self.planning_tool.plans:
-                   return f"Error: Plan with ID {self.active_plan_id} not found"
-
-               plan_data = self.planning_tool.plans[self.active_plan_id]
-               title = plan_data.get("title", "Untitled Plan")
-               steps = plan_data.get("steps", [])
-               step_statuses = plan_data.get("step_statuses", [])
-               step_notes = plan_data.get("step_notes", [])
-
-               # 确保step_statuses和step_notes与步骤数量匹配
-               while len(step_statuses) < len(steps):
-                   step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-               while len(step_notes) < len(steps):
-                   step_notes.append("")
-
-               # 按状态计算步骤数量
-               status_counts = {status: 0 for status in PlanStepStatus.get_all_statuses()}
-
-               for status in step_statuses:
-                   if status in status_counts:
-                       status_counts[status] += 1
-
-               completed = status_counts[PlanStepStatus.COMPLETED.value]
-               total = len(steps)
-               progress = (completed / total) * 100 if total > 0 else 0
-
-               plan_text = f"Plan: {title} (ID: {self.active_plan_id})\n"
-               plan_text += "=" * len(plan_text) + "\n\n"
-
-               plan_text += (
-                   f"Progress: {completed}/{total} steps completed ({progress:.1f}%)\n"
-               )
-               plan_text += f"Status: {status_counts[PlanStepStatus.COMPLETED.value]} completed, {status_counts[PlanStepStatus.IN_PROGRESS.value]} in progress, "
-               plan_text += f"{status_counts[PlanStepStatus.BLOCKED.value]} blocked, {status_counts[PlanStepStatus.NOT_STARTED.value]} not started\n\n"
-               plan_text += "Steps:\n"
-
-               status_marks = PlanStepStatus.get_status_marks()
-
-               for i, (step, status, notes) in enumerate(
-                   zip(steps, step_statuses, step_notes)
-               ):
-                   # 使用状态标记来表示步骤状态
-                   status_mark = status_marks.get(
-                       status, status_marks[PlanStepStatus.NOT_STARTED.value]
-                   )
-
-                   plan_text += f"{i}. {status_mark} {step}\n"
-                   if notes:
-                       plan_text += f"   Notes: {notes}\n"
-
-               return plan_text
-           except Exception as e:
-               logger.error(f"Error generating plan text from storage: {e}")
-               return f"Error: Unable to retrieve plan with ID {self.active_plan_id}"
-
-       async def _finalize_plan(self) -> str:
-           """最终确定计划并提供使用流程的LLM直接生成的摘要。"""
-           plan_text = await self._get_plan_text()
-
-           # 使用流程的LLM直接创建摘要
-           try:
-               system_message = Message.system_message(
-                   "You are a planning assistant. Your task is to summarize the completed plan."
-               )
-
-               user_message = Message.user_message(
-                   f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
-               )
-
-               response = await self.llm.ask(
-                   messages=[user_message], system_msgs=[system_message]
-               )
-
-               return f"Plan completed:\n\n{response}"
-           except Exception as e:
-               logger.error(f"Error finalizing plan with LLM: {e}")
-
-               # 如果LLM失败，使用代理生成摘要
-               try:
-                   agent = self.primary_agent
-                   summary_prompt = f"""
-                   The plan has been completed. Here is the final plan status:
-
-                   {plan_text}
-
-                   Please provide a summary of what was accomplished and any final thoughts.
-                   """
-                   summary = await agent.run(summary_prompt)
-                   return f"Plan completed:\n\n{summary}"
-               except Exception as e2:
-                   logger.error(f"Error finalizing plan with agent: {e2}")
-                   return "Plan completed. Error generating summary."
+    async def _create_initial_plan(self, request: str) -> None:
+        """根据请求创建初始计划；相同（规范化后）请求复用缓存的计划步骤，省去一次LLM调用。"""
+        logger.info(f"Creating initial plan with ID: {self.active_plan_id}")  # 记录创建计划的日志信息
+        self._plan_text_memo = None
+
+        # 问候、测试之类的简单请求无需LLM规划，直接使用默认计划
+        stripped = request.strip()
+        if _TRIVIAL_REQUEST_RE.match(stripped) or len(stripped) < self.trivial_request_chars:
+            logger.info("Trivial request, using default plan")
+            await self._create_default_plan(request)
+            return
+
+        key = _plan_template_key(request)
+        # 同一请求并发到达时只让一个流程调用LLM，其余等待后直接命中缓存
+        lock = _PLAN_TEMPLATE_LOCKS.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                steps = _PLAN_TEMPLATE_CACHE.get(key)
+                if steps is not None:
+                    _PLAN_TEMPLATE_CACHE.move_to_end(key)
+                    logger.info("Reusing cached plan template for request")
+                    await self.planning_tool.execute(
+                        command="create",
+                        plan_id=self.active_plan_id,
+                        title=request[:50],
+                        steps=list(steps),
+                    )
+                    return
+
+                await self._create_plan_with_llm(request, key)
+        finally:
+            if not lock.locked() and _PLAN_TEMPLATE_LOCKS.get(key) is lock:
+                del _PLAN_TEMPLATE_LOCKS[key]
+
+    async def _create_plan_with_llm(self, request: str, key: str) -> None:
+        """使用流程的LLM和PlanningTool创建初始计划，成功后将计划步骤写入模板缓存。"""
+        # 创建用于计划创建的系统消息
+        system_message = Message.system_message(
+            "You are a planning assistant. Create a concise, actionable plan with clear steps. "
+            "Focus on key milestones rather than detailed sub-steps. "
+            "Optimize for clarity and efficiency."
+        )
+
+        # 创建包含请求的用户消息
+        user_message = Message.user_message(
+            f"Create a reasonable plan with clear steps to accomplish the task: {request}"
+        )
+
+        # 使用PlanningTool调用LLM
+        response = await self.llm.ask_tool(
+            messages=[user_message],
+            system_msgs=[system_message],
+            tools=[self.planning_tool.to_param()],
+            tool_choice=ToolChoice.AUTO,
+        )
+
+        # 如果存在工具调用，则进行处理
+        if response.tool_calls:
+            for tool_call in response.tool_calls:
+                if tool_call.function.name == "planning":
+                    # 解析参数
+                    args = tool_call.function.arguments
+                    if isinstance(args, str):
+                        try:
+                            args = json.loads(args)
+                        except json.JSONDecodeError:
+                            logger.error(f"Failed to parse tool arguments: {args}")
+                            continue
+
+                    # 确保plan_id设置正确并执行工具
+                    args["plan_id"] = self.active_plan_id
+
+                    # 通过ToolCollection而不是直接执行工具
+                    result = await self.planning_tool.execute(**args)
+
+                    logger.info(f"Plan creation result: {str(result)}")
+
+                    plan_data = self.planning_tool.plans.get(self.active_plan_id)
+                    if plan_data and plan_data.get("steps"):
+                        _PLAN_TEMPLATE_CACHE[key] = list(plan_data["steps"])
+                        if len(_PLAN_TEMPLATE_CACHE) > _PLAN_TEMPLATE_CACHE_SIZE:
+                            _PLAN_TEMPLATE_CACHE.popitem(last=False)  # 淘汰最久未使用的模板
+                    return
+
+        # 如果执行到这里，创建默认计划
+        logger.warning("Creating default plan")
+        await self._create_default_plan(request)
+
+    async def _create_default_plan(self, request: str) -> None:
+        """创建通用的三步默认计划。"""
+        # 使用ToolCollection创建默认计划
+        await self.planning_tool.execute(
+            **{
+                "command": "create",
+                "plan_id": self.active_plan_id,
+                "title": f"Plan for: {request[:50]}{'...' if len(request) > 50 else ''}",
+                "steps": ["Analyze request", "Execute task", "Verify results"],
+            }
+        )
+
+    def _get_step_types(self, steps: List[str]) -> List[Optional[str]]:
+        """返回各步骤的类型标记；步骤列表被替换（例如计划更新）后重新分类"""
+        cache = self._step_types
+        if cache is None or cache[0] is not steps:
+            cache = self._step_types = (steps, _classify_steps(steps))
+        return cache[1]
+
+    def _normalize_plan(self) -> None:
+        """确保活动计划的 step_statuses 和 step_notes 与步骤数量一致"""
+        plan_data = self.planning_tool.plans.get(self.active_plan_id)
+        if plan_data is None:
+            return
+
+        self._plan_text_memo = None
+        n = len(plan_data.get("steps", []))
+        step_statuses = plan_data.setdefault("step_statuses", [])
+        if len(step_statuses) < n:
+            step_statuses.extend(
+                [PlanStepStatus.NOT_STARTED.value] * (n - len(step_statuses))
+            )
+        step_notes = plan_data.setdefault("step_notes", [])
+        if len(step_notes) < n:
+            step_notes.extend([""] * (n - len(step_notes)))
+
+    async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
+        """
+        解析当前计划以确定第一个未完成步骤的索引和信息。
+        如果没有找到活动步骤，则返回(None, None)。
+        """
+        if (
+            not self.active_plan_id
+            or self.active_plan_id not in self.planning_tool.plans
+        ):
+            logger.error(f"Plan with ID {self.active_plan_id} not found")
+            return None, None
+
+        try:
+            # 直接从规划工具存储中访问计划数据（execute() 中已补齐状态列表）
+            plan_data = self.planning_tool.plans[self.active_plan_id]
+            steps = plan_data.get("steps", [])
+            step_statuses = plan_data["step_statuses"]
+
+            # 查找第一个未完成的步骤
+            for i, (step, status) in enumerate(zip(steps, step_statuses)):
+                if status in _ACTIVE_STATUSES:
+                    # 如果可用，提取步骤类型/类别
+                    step_info = {"text": step}
+
+                    # 步骤类型（例如[SEARCH]或[CODE]）在计划步骤变化时批量提取一次
+                    step_type = self._get_step_types(steps)[i]
+                    if step_type:
+                        step_info["type"] = step_type
+
+                    # 将当前步骤标记为进行中
+                    await self._mark_step(i, PlanStepStatus.IN_PROGRESS.value)
+
+                    return i, step_info
+
+            return None, None  # 没有找到活动步骤
+
+        except Exception as e:
+            logger.warning(f"Error finding current step index: {e}")
+            return None, None
+
+    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
+        """使用指定的代理执行当前步骤。"""
+        # 为代理准备带有当前计划状态的上下文
+        plan_status = await self._get_plan_text()
+        step_text = step_info.get("text", f"Step {self.current_step_index}")
+
+        # 创建一个提示，供代理执行当前步骤
+        step_prompt = f"""
+        CURRENT PLAN STATUS:
+        {plan_status}
+
+        YOUR CURRENT TASK:
+        You are now working on step {self.current_step_index}: "{step_text}"
+
+        Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
+        """
+
+        # 使用agent.run()执行步骤
+        try:
+            step_result = await executor.run(step_prompt)
+
+            # 成功执行后，将步骤标记为已完成
+            await self._mark_step_completed()
+
+            return step_result
+        except Exception as e:
+            logger.error(f"Error executing step {self.current_step_index}: {e}")
+            return f"Error executing step {self.current_step_index}: {str(e)}"
+
+    async def _mark_step_completed(self) -> None:
+        """将当前步骤标记为已完成。"""
+        if self.current_step_index is None:
+            return
+
+        await self._mark_step(self.current_step_index, PlanStepStatus.COMPLETED.value)
+        logger.info(
+            f"Marked step {self.current_step_index} as completed in plan {self.active_plan_id}"
+        )
+
+    async def _mark_step(self, index: int, status: str) -> None:
+        """更新步骤状态；PlanningTool 的计划存储在内存中，直接修改，其他规划工具走工具调用。"""
+        if isinstance(self.planning_tool, PlanningTool) and self._set_step_status_fast(
+            index, status
+        ):
+            return
+
+        try:
+            await self.planning_tool.execute(
+                command="mark_step",
+                plan_id=self.active_plan_id,
+                step_index=index,
+                step_status=status,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update plan status: {e}")
+            # 如果需要，直接在规划工具存储中更新步骤状态
+            self._set_step_status_fast(index, status)
+        finally:
+            self._plan_text_memo = None  # 使缓存的计划文本失效
+
+    def _set_step_status_fast(self, index: int, status: str) -> bool:
+        """直接在规划工具存储中设置步骤状态，计划不存在时返回 False"""
+        plan_data = self.planning_tool.plans.get(self.active_plan_id)
+        if plan_data is None:
+            return False
+
+        plan_data["step_statuses"][index] = status
+        self._plan_text_memo = None  # 使缓存的计划文本失效
+        return True
+
+    async def _get_plan_text(self) -> str:
+        """获取当前计划的格式化文本；计划在本地存储中时直接渲染，内容未变则复用上次结果。"""
+        plan_data = self.planning_tool.plans.get(self.active_plan_id)
+        if plan_data is not None:
+            memo = self._plan_text_memo
+            if memo is not None and memo[0] == self.active_plan_id:
+                return memo[1]
+            plan_text = self._generate_plan_text_from_storage()
+            self._plan_text_memo = (self.active_plan_id, plan_text)
+            return plan_text
+
+        # 计划由外部管理时回退到规划工具
+        try:
+            result = await self.planning_tool.execute(
+                command="get", plan_id=self.active_plan_id
+            )
+            return result.output if hasattr(result, "output") else str(result)
+        except Exception as e:
+            logger.error(f"Error getting plan: {e}")
+            return self._generate_plan_text_from_storage()
+
+    def _generate_plan_text_from_storage(self) -> str:
+        """如果规划工具失败，则直接从存储中生成计划文本。"""
+        try:
+            if self.active_plan_id not in self.planning_tool.plans:
+                return f"Error: Plan with ID {self.active_plan_id} not found"
+
+            plan_data = self.planning_tool.plans[self.active_plan_id]
+            title = plan_data.get("title", "Untitled Plan")
+            steps = plan_data.get("steps", [])
+            step_statuses = plan_data.get("step_statuses", [])
+            step_notes = plan_data.get("step_notes", [])
+
+            # 按状态计算步骤数量
+            status_counts = dict.fromkeys(PlanStepStatus.get_all_statuses(), 0)
+
+            for status in step_statuses:
+                if status in status_counts:
+                    status_counts[status] += 1
+
+            completed = status_counts[PlanStepStatus.COMPLETED.value]
+            total = len(steps)
+            progress = (completed / total) * 100 if total > 0 else 0
+
+            header = f"Plan: {title} (ID: {self.active_plan_id})\n"
+            parts = [
+                header,
+                "=" * len(header) + "\n\n",
+                f"Progress: {completed}/{total} steps completed ({progress:.1f}%)\n",
+                f"Status: {status_counts[PlanStepStatus.COMPLETED.value]} completed, {status_counts[PlanStepStatus.IN_PROGRESS.value]} in progress, ",
+                f"{status_counts[PlanStepStatus.BLOCKED.value]} blocked, {status_counts[PlanStepStatus.NOT_STARTED.value]} not started\n\n",
+                "Steps:\n",
+            ]
+
+            status_marks = PlanStepStatus.get_status_marks()
+            default_mark = status_marks[PlanStepStatus.NOT_STARTED.value]
+            append = parts.append
+            rows = zip(steps, step_statuses, step_notes)
+
+            for i, (step, status, notes) in enumerate(rows):
+                # 使用状态标记来表示步骤状态
+                append(f"{i}. {status_marks.get(status, default_mark)} {step}\n")
+                if notes:
+                    append(f"   Notes: {notes}\n")
+
+            return "".join(parts)
+        except Exception as e:
+            logger.error(f"Error generating plan text from storage: {e}")
+            return f"Error: Unable to retrieve plan with ID {self.active_plan_id}"
+
+    async def _finalize_plan(self) -> str:
+        """最终确定计划并提供使用流程的LLM直接生成的摘要。"""
+        plan_text = await self._get_plan_text()
+        self._plan_text_memo = None  # 计划已结束，释放缓存的计划文本
+
+        # 步骤与状态相同的已完成计划直接复用之前的摘要
+        plan_data = self.planning_tool.plans.get(self.active_plan_id)
+        summary_key = _SUMMARY_CACHE.make_key(plan_data) if plan_data else None
+        if summary_key:
+            cached = _SUMMARY_CACHE.get(summary_key)
+            if cached is not None:
+                return f"Plan completed:\n\n{cached}"
+
+        # 使用流程的LLM直接创建摘要
+        try:
+            system_message = Message.system_message(
+                "You are a planning assistant. Your task is to summarize the completed plan."
+            )
+
+            user_message = Message.user_message(
+                f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
+            )
+
+            response = await self.llm.ask(
+                messages=[user_message], system_msgs=[system_message]
+            )
+            if summary_key and response:
+                _SUMMARY_CACHE.put(summary_key, response)
+
+            return f"Plan completed:\n\n{response}"
+        except Exception as e:
+            logger.error(f"Error finalizing plan with LLM: {e}")
+
+            # 如果LLM失败，使用代理生成摘要
+            try:
+                agent = self.primary_agent
+                summary_prompt = f"""
+                The plan has been completed. Here is the final plan status:
+
+                {plan_text}
+
+                Please provide a summary of what was accomplished and any final thoughts.
+                """
+                summary = await agent.run(summary_prompt)
+                return f"Plan completed:\n\n{summary}"
+            except Exception as e2:
+                logger.error(f"Error finalizing plan with agent: {e2}")
+                return "Plan completed. Error generating summary."
@@ -1,5 +1,8 @@
 import math
-from typing import Dict, List, Optional, Union
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import tiktoken
 from openai import (
@@ -177,6 +180,50 @@ class TokenCounter:
         return total_tokens
 
 
+class InMemoryLLMCache:
+    """Process-local LRU cache of LLM responses keyed by a request hash"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._store: "OrderedDict[str, ChatCompletionMessage]" = OrderedDict()
+
+    def lookup(self, key: str) -> Optional[ChatCompletionMessage]:
+        response = self._store.get(key)
+        if response is not None:
+            self._store.move_to_end(key)
+        return response
+
+    def update(self, key: str, response: ChatCompletionMessage) -> None:
+        self._store[key] = response
+        self._store.move_to_end(key)
+        if len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+
+class SQLiteLLMCache:
+    """LLM response cache persisted in a SQLite file so it survives across runs"""
+
+    def __init__(self, path: Union[str, Path]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+        )
+
+    def lookup(self, key: str) -> Optional[ChatCompletionMessage]:
+        row = self._conn.execute(
+            "SELECT response FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return ChatCompletionMessage.model_validate_json(row[0]) if row else None
+
+    def update(self, key: str, response: ChatCompletionMessage) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response) VALUES (?, ?)",
+                (key, response.model_dump_json()),
+            )
+
+
 class LLM:
     _instances: Dict[str, "LLM"] = {}
 
@@ -230,6 +277,9 @@ class LLM:
 
             self.token_counter = TokenCounter(self.tokenizer)
 
+            # Optional response cache (InMemoryLLMCache / SQLiteLLMCache); disabled by default
+            self.llm_cache = None
+
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
         if not text:
@@ -267,6 +317,42 @@ class LLM:
 
         return "Token limit exceeded"
 
+    @property
+    def supports_prompt_cache(self) -> bool:
+        """Whether the backend honours explicit `cache_control` breakpoints (Anthropic)"""
+        return self.api_type == "anthropic" or "anthropic" in (self.base_url or "")
+
+    @property
+    def supports_prompt_cache_key(self) -> bool:
+        """Whether the backend accepts OpenAI's `prompt_cache_key` routing hint"""
+        return self.api_type == "openai" and "api.openai.com" in (self.base_url or "")
+
+    @staticmethod
+    def mark_cache_breakpoint(message: dict) -> dict:
+        """
+        Mark a formatted message as the end of a cacheable prompt prefix.
+
+        Anthropic caches everything up to and including the content block that
+        carries `cache_control`; OpenAI-compatible backends cache static prefixes
+        automatically and need no marker.
+        """
+        content = message.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if content:
+            content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+            message["content"] = content
+        return message
+
+    def _prepare_system_msgs(
+        self, system_msgs: List[Union[dict, Message]], supports_images: bool
+    ) -> List[dict]:
+        """Format system messages and mark them as a cacheable prefix when supported"""
+        formatted = self.format_messages(system_msgs, supports_images)
+        if formatted and self.supports_prompt_cache:
+            formatted[-1] = self.mark_cache_breakpoint(dict(formatted[-1]))
+        return formatted
+
     @staticmethod
     def format_messages(
         messages: List[Union[dict, Message]], supports_images: bool = False
@@ -355,6 +441,94 @@ class LLM:
 
         return formatted_messages
 
+    def _prepare_ask_params(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]],
+        temperature: Optional[float],
+    ) -> Tuple[dict, int]:
+        """Format messages, enforce the token limit and build completion params."""
+        # Check if the model supports images
+        supports_images = self.model in MULTIMODAL_MODELS
+
+        # Format system and user messages with image support check
+        if system_msgs:
+            system_msgs = self._prepare_system_msgs(system_msgs, supports_images)
+            messages = system_msgs + self.format_messages(messages, supports_images)
+        else:
+            messages = self.format_messages(messages, supports_images)
+
+        # Calculate input token count
+        input_tokens = self.count_message_tokens(messages)
+
+        # Check if token limits are exceeded
+        if not self.check_token_limit(input_tokens):
+            error_message = self.get_limit_error_message(input_tokens)
+            # Raise a special exception that won't be retried
+            raise TokenLimitExceeded(error_message)
+
+        params = {
+            "model": self.model,
+            "messages": messages,
+        }
+
+        if self.model in REASONING_MODELS:
+            params["max_completion_tokens"] = self.max_tokens
+        else:
+            params["max_tokens"] = self.max_tokens
+            params["temperature"] = (
+                temperature if temperature is not None else self.temperature
+            )
+
+        return params, input_tokens
+
+    @retry(
+        wait=wait_random_exponential(min=1, max=60),
+        stop=stop_after_attempt(6),
+        retry=retry_if_exception_type(
+            (OpenAIError, Exception, ValueError)
+        ),  # Don't retry TokenLimitExceeded
+    )
+    async def _open_stream(self, params: dict):
+        """Open a streaming completion, retrying rate-limit and API errors like `ask`."""
+        return await self.client.chat.completions.create(**params, stream=True)
+
+    async def ask_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response text as it is generated.
+
+        Opening the stream is retried like `ask`; errors after the first delta
+        has been yielded propagate to the caller. Callers may stop iterating (and
+        `aclose()` the generator) as soon as they have what they need; the
+        underlying HTTP stream is closed and generation stops.
+
+        Yields:
+            str: Content deltas in arrival order
+        """
+        params, input_tokens = self._prepare_ask_params(
+            messages, system_msgs, temperature
+        )
+        self.update_token_count(input_tokens)
+
+        response = await self._open_stream(params)
+        completion_parts: List[str] = []
+        try:
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    completion_parts.append(delta)
+                    yield delta
+        finally:
+            await response.close()
+            self.total_completion_tokens += self.count_tokens("".join(completion_parts))
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
@@ -388,37 +562,9 @@ class LLM:
             Exception: For unexpected errors
         """
         try:
-            # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
-
-            # Format system and user messages with image support check
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
-
-            params = {
-                "model": self.model,
-                "messages": messages,
-            }
-
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
-                params["temperature"] = (
-                    temperature if temperature is not None else self.temperature
-                )
+            params, input_tokens = self._prepare_ask_params(
+                messages, system_msgs, temperature
+            )
 
             if not stream:
                 # Non-streaming request
@@ -565,7 +711,7 @@ class LLM:
             # Add system messages if provided
             if system_msgs:
                 all_messages = (
-                    self.format_messages(system_msgs, supports_images=True)
+                    self._prepare_system_msgs(system_msgs, supports_images=True)
                     + formatted_messages
                 )
             else:
@@ -686,7 +832,7 @@ class LLM:
 
             # Format messages
             if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
+                system_msgs = self._prepare_system_msgs(system_msgs, supports_images)
                 messages = system_msgs + self.format_messages(messages, supports_images)
             else:
                 messages = self.format_messages(messages, supports_images)
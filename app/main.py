@@ -1,59 +1,43 @@
+import argparse
 import asyncio
-import sys
 from typing import List, Optional
 
-from app.agent.manus import Manus
-from app.agent.planning import PlanningAgent
-from app.agent.pipeline_agent import PipelineAgent
 from app.logger import logger
 
 
-async def main():
-    """主函数，运行Manus代理。"""
-    args = sys.argv[1:]  # 获取命令行参数
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数；未知参数被忽略"""
+    parser = argparse.ArgumentParser(description="运行 OpenManus 代理")
+    parser.add_argument("--agent", default="manus", help="代理类型：manus、planning 或 pipeline")
+    parser.add_argument("--image", default=None, help="输入图像路径（pipeline 代理）")
+    parser.add_argument("--project", default=None, help="项目名称（pipeline 代理）")
+    args, _ = parser.parse_known_args(argv)
+    return args
 
-    # 确定要使用的代理
-    agent_type = "manus"  # 默认使用Manus代理
-    input_image = None
-    project_name = None
 
-    # 解析命令行参数
-    i = 0
-    while i < len(args):
-        if args[i] == "--agent":
-            if i + 1 < len(args):
-                agent_type = args[i + 1]
-                i += 2
-            else:
-                logger.error("缺少代理类型参数")
-                return
-        elif args[i] == "--image":
-            if i + 1 < len(args):
-                input_image = args[i + 1]
-                i += 2
-            else:
-                logger.error("缺少图像路径参数")
-                return
-        elif args[i] == "--project":
-            if i + 1 < len(args):
-                project_name = args[i + 1]
-                i += 2
-            else:
-                logger.error("缺少项目名称参数")
-                return
-        else:
-            i += 1
+async def main():
+    """主函数，运行Manus代理。"""
+    args = parse_args()  # 获取命令行参数
+    agent_type = args.agent
+    input_image = args.image
+    project_name = args.project
 
-    # 根据指定类型创建代理
+    # 根据指定类型创建代理；只导入实际使用的代理模块
     if agent_type == "pipeline" and input_image:
+        from app.agent.pipeline_agent import PipelineAgent
+
         agent = PipelineAgent()
         logger.info(f"使用Pipeline代理处理图像: {input_image}, 项目名称: {project_name or 'auto_generated_project'}")
         result = await agent.run(input_image_path=input_image, project_name=project_name)
     elif agent_type == "planning":
+        from app.agent.planning import PlanningAgent
+
         agent = PlanningAgent()
         logger.info("使用Planning代理")
         result = await agent.run()
     else:
+        from app.agent.manus import Manus
+
         agent = Manus()
         logger.info("使用Manus代理")
         result = await agent.run()
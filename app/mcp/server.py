@@ -1,12 +1,12 @@
 import argparse  # 命令行参数解析库
 import asyncio  # 异步编程库
 import atexit  # 注册退出时执行的函数
-import json  # JSON 处理库
 import logging  # 日志记录库
 import os  # 操作系统相关功能库
 import sys  # 系统相关功能库
+from functools import lru_cache  # 缓存按类型选择的序列化函数
 from inspect import Parameter, Signature  # 用于获取函数签名信息
-from typing import Any, Dict, Optional  # 类型提示
+from typing import Any, Callable, Dict, Optional  # 类型提示
 
 from mcp.server.fastmcp import FastMCP  # 导入 FastMCP 类
 
@@ -29,6 +29,35 @@ from app.tool.bash import Bash  # 导入 Bash 工具类
 from app.tool.browser_use_tool import BrowserUseTool  # 导入浏览器使用工具类
 from app.tool.str_replace_editor import StrReplaceEditor  # 导入字符串替换编辑器工具类
 from app.tool.terminate import Terminate  # 导入终止工具类
+from app.utils.json import dumps as _json_dumps  # 序列化大体积的工具结果
+
+# JSON Schema 类型到 Python 类型的映射，未知类型使用 Any
+_JSON_TO_PY: Dict[str, Any] = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+}
+
+
+def _dump_model(result: Any) -> str:
+    return _json_dumps(result.model_dump())
+
+
+def _passthrough(result: Any) -> Any:
+    return result
+
+
+@lru_cache(maxsize=None)
+def _result_serializer(result_type: type) -> Callable[[Any], Any]:
+    """根据工具结果的类型选择序列化方式，每种类型只判定一次"""
+    if hasattr(result_type, "model_dump"):
+        return _dump_model
+    if issubclass(result_type, dict):
+        return _json_dumps
+    return _passthrough
 
 
 class MCPServer:
@@ -62,12 +91,8 @@ class MCPServer:
 
             logger.info(f"{tool_name} 的结果: {result}")  # 记录结果
 
-            # 处理不同类型的结果（匹配原始逻辑）
-            if hasattr(result, "model_dump"):
-                return json.dumps(result.model_dump())
-            elif isinstance(result, dict):
-                return json.dumps(result)
-            return result
+            # 处理不同类型的结果（匹配原始逻辑），序列化方式按结果类型只判定一次
+            return _result_serializer(type(result))(result)
 
         # 设置方法的元数据
         tool_method.__name__ = tool_name
@@ -97,20 +122,19 @@ class MCPServer:
         required_params = tool_function.get("parameters", {}).get("required", [])
 
         # 构建文档字符串（匹配原始格式）
-        docstring = description
-        if param_props:
-            docstring += "\n\nParameters:\n"
-            for param_name, param_details in param_props.items():
-                required_str = (
-                    "(required)" if param_name in required_params else "(optional)"
-                )
-                param_type = param_details.get("type", "any")
-                param_desc = param_details.get("description", "")
-                docstring += (
-                    f"    {param_name} ({param_type}) {required_str}: {param_desc}\n"
-                )
-
-        return docstring
+        if not param_props:
+            return description
+
+        parts = [description, "\n\nParameters:\n"]
+        for param_name, param_details in param_props.items():
+            required_str = (
+                "(required)" if param_name in required_params else "(optional)"
+            )
+            param_type = param_details.get("type", "any")
+            param_desc = param_details.get("description", "")
+            parts.append(f"    {param_name} ({param_type}) {required_str}: {param_desc}\n")
+
+        return "".join(parts)
 
     def _build_signature(self, tool_function: dict) -> Signature:
         """从工具函数元数据构建函数签名。"""
@@ -125,19 +149,7 @@ class MCPServer:
             default = Parameter.empty if param_name in required_params else None
 
             # 将 JSON Schema 类型映射到 Python 类型（与原始代码相同）
-            annotation = Any
-            if param_type == "string":
-                annotation = str
-            elif param_type == "integer":
-                annotation = int
-            elif param_type == "number":
-                annotation = float
-            elif param_type == "boolean":
-                annotation = bool
-            elif param_type == "object":
-                annotation = dict
-            elif param_type == "array":
-                annotation = list
+            annotation = _JSON_TO_PY.get(param_type, Any)
 
             # 创建具有与原始代码相同结构的参数
             param = Parameter(
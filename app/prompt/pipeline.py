@@ -21,12 +21,9 @@ SYSTEM_PROMPT = """你是一个专门执行自动化工作流的代理，可以
 工作路径: {directory}
 """
 
-# 下一步提示词
+# 下一步提示词（静态内容，便于提示缓存复用）
 NEXT_STEP_PROMPT = """基于当前工作流的状态，请思考下一步应该执行什么工具调用。你应该自动化执行从UI图像分析到代码生成的流程。
 
-当前工作流已完成的步骤:
-{pipeline_status}
-
 请考虑:
 1. 目前工作流进行到哪一步？
 2. 下一步应该调用哪个工具？
@@ -40,3 +37,8 @@ NEXT_STEP_PROMPT = """基于当前工作流的状态，请思考下一步应该
 
 请提供详细的下一步工具调用，或者如果工作流已完成，请总结结果并终止执行。
 """
+
+# 工作流状态提示词（每步动态生成）
+PIPELINE_STATUS_PROMPT = """当前工作流已完成的步骤:
+{pipeline_status}
+"""
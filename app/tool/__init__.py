@@ -1,16 +1,32 @@
+import importlib
+
 from app.tool.base import BaseTool
-from app.tool.bash import Bash
-from app.tool.browser_use_tool import BrowserUseTool
-from app.tool.create_chat_completion import CreateChatCompletion
-from app.tool.planning import PlanningTool
-from app.tool.str_replace_editor import StrReplaceEditor
-from app.tool.terminate import Terminate
-from app.tool.tool_collection import ToolCollection
-from app.tool.wireframe_generator import WireframeGenerator
-from app.tool.wireframe_to_html import WireframeToHTML
-from app.tool.html_to_springboot import HTMLToSpringboot
-from app.tool.html_to_api_doc import HTMLToAPIDoc
-from app.tool.html_to_vue import HTMLToVue
+
+# 工具类按需导入（PEP 562）：浏览器、代码生成等工具依赖较重，只在首次访问时加载
+_LAZY = {
+    "Bash": "app.tool.bash",
+    "BrowserUseTool": "app.tool.browser_use_tool",
+    "CreateChatCompletion": "app.tool.create_chat_completion",
+    "PlanningTool": "app.tool.planning",
+    "StrReplaceEditor": "app.tool.str_replace_editor",
+    "Terminate": "app.tool.terminate",
+    "ToolCollection": "app.tool.tool_collection",
+    "WireframeGenerator": "app.tool.wireframe_generator",
+    "WireframeToHTML": "app.tool.wireframe_to_html",
+    "HTMLToSpringboot": "app.tool.html_to_springboot",
+    "HTMLToAPIDoc": "app.tool.html_to_api_doc",
+    "HTMLToVue": "app.tool.html_to_vue",
+}
+
+
+def __getattr__(name: str):
+    module_path = _LAZY.get(name)
+    if module_path is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    obj = getattr(importlib.import_module(module_path), name)
+    globals()[name] = obj  # 缓存到模块命名空间，后续访问不再经过 __getattr__
+    return obj
+
 
 __all__ = [
     "BaseTool",
@@ -20,9 +20,20 @@ class BaseTool(ABC, BaseModel):
     async def execute(self, **kwargs) -> Any:
         """使用给定参数执行工具的抽象方法，子类必须实现。"""
 
+    _param_cache: Optional[tuple] = None  # (名称, 描述, 参数, 函数调用格式) 的缓存
+
     def to_param(self) -> Dict:
-        """将工具转换为函数调用格式。"""
-        return {
+        """将工具转换为函数调用格式；名称、描述和参数未被替换时返回缓存的结果（调用方不应修改）。"""
+        cache = self._param_cache
+        if (
+            cache is not None
+            and cache[0] is self.name
+            and cache[1] is self.description
+            and cache[2] is self.parameters
+        ):
+            return cache[3]
+
+        param = {
             "type": "function",
             "function": {
                 "name": self.name,
@@ -30,6 +41,8 @@ class BaseTool(ABC, BaseModel):
                 "parameters": self.parameters,
             },
         }
+        self._param_cache = (self.name, self.description, self.parameters, param)
+        return param
 
 
 class ToolResult(BaseModel):
@@ -45,7 +58,8 @@ class ToolResult(BaseModel):
 
     def __bool__(self):
         """判断工具执行结果是否有有效输出或错误。"""
-        return any(getattr(self, field) for field in self.__fields__)
+        # 直接读取字段，避免遍历字段表；与原先逐字段判断真值的语义一致
+        return bool(self.output or self.error or self.base64_image or self.system)
 
     def __add__(self, other: "ToolResult"):
         """合并两个工具执行结果。"""
@@ -71,7 +85,14 @@ class ToolResult(BaseModel):
 
     def replace(self, **kwargs):
         """返回一个新的ToolResult，替换给定的字段。"""
-        return type(self)(**{**self.dict(), **kwargs})
+        fields = {
+            "output": self.output,
+            "error": self.error,
+            "base64_image": self.base64_image,
+            "system": self.system,
+        }
+        fields.update(kwargs)
+        return type(self)(**fields)
 
 
 class CLIResult(ToolResult):
@@ -20,38 +20,115 @@ class _BashSession:
     _process: asyncio.subprocess.Process  # 子进程对象
 
     command: str = "/bin/bash"  # 默认执行的bash命令
-    _output_delay: float = 0.2  # 输出延迟时间，单位秒
     _timeout: float = 120.0  # 命令执行超时时间，单位秒
-    _sentinel: str = "<<exit>>"  # 用于标记命令执行结束的特殊字符串
+    # 命令结束后向专用管道（文件描述符由 DONE_FD 环境变量给出）写一个换行作为结束标记，
+    # 与命令的标准输出分开，输出中出现任何内容都不会被误判为结束
+    _done_signal: str = "; printf '\\n' >&$DONE_FD\n"
 
     def __init__(self):
         self._started = False  # 初始化时，会话未启动
         self._timed_out = False  # 初始化时，未发生超时
+        self._stdout_buf = bytearray()  # 后台持续收集的标准输出
+        self._stderr_buf = bytearray()  # 后台持续收集的标准错误输出
+        self._drain_tasks: list[asyncio.Task] = []
+        self._done_reader: Optional[asyncio.StreamReader] = None  # 结束标记管道的读端
+        self._done_transport: Optional[asyncio.ReadTransport] = None
 
     async def start(self):
         """启动bash shell会话。"""
         if self._started:
             return  # 如果已启动，则直接返回
-        # 创建子进程，执行bash命令
-        self._process = await asyncio.create_subprocess_shell(
-            self.command,
-            preexec_fn=os.setsid,  # 设置进程组ID
-            shell=True,  # 使用shell执行命令
-            bufsize=0,  # 缓冲区大小
-            stdin=asyncio.subprocess.PIPE,  # 标准输入为管道
-            stdout=asyncio.subprocess.PIPE,  # 标准输出为管道
-            stderr=asyncio.subprocess.PIPE,  # 标准错误为管道
+        # 结束标记管道：写端传给bash，读端留在本进程
+        done_r, done_w = os.pipe()
+        try:
+            # 创建子进程，执行bash命令
+            self._process = await asyncio.create_subprocess_shell(
+                self.command,
+                preexec_fn=os.setsid,  # 设置进程组ID
+                shell=True,  # 使用shell执行命令
+                bufsize=0,  # 缓冲区大小
+                stdin=asyncio.subprocess.PIPE,  # 标准输入为管道
+                stdout=asyncio.subprocess.PIPE,  # 标准输出为管道
+                stderr=asyncio.subprocess.PIPE,  # 标准错误为管道
+                pass_fds=(done_w,),  # 子进程继承结束标记管道的写端
+                env={**os.environ, "DONE_FD": str(done_w)},
+            )
+        except BaseException:
+            os.close(done_r)
+            raise
+        finally:
+            os.close(done_w)  # 父进程不再需要写端，bash退出后读端会读到EOF
+
+        loop = asyncio.get_running_loop()
+        self._done_reader = asyncio.StreamReader()
+        self._done_transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(self._done_reader),
+            os.fdopen(done_r, "rb", 0),
         )
+        # 标准输出和标准错误由后台任务持续读取，避免管道写满阻塞bash
+        self._drain_tasks = [
+            asyncio.create_task(self._drain(self._process.stdout, self._stdout_buf)),
+            asyncio.create_task(self._drain(self._process.stderr, self._stderr_buf)),
+        ]
         self._started = True  # 标记会话已启动
 
+    @staticmethod
+    async def _drain(stream: asyncio.StreamReader, buf: bytearray):
+        """持续读取流并追加到缓冲区，直到管道关闭。"""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return
+            buf += chunk
+
+    def _cancel_io(self):
+        """取消后台读取任务并关闭结束标记管道。"""
+        for task in self._drain_tasks:
+            task.cancel()
+        if self._done_transport:
+            self._done_transport.close()
+            self._done_transport = None
+
     def stop(self):
         """终止bash shell会话。"""
         if not self._started:
             raise ToolError("会话尚未启动。")  # 如果会话未启动，则抛出异常
+        self._cancel_io()
         if self._process.returncode is not None:
             return  # 如果进程已结束，则直接返回
         self._process.terminate()  # 终止进程
 
+    async def aclose(self):
+        """终止bash进程并等待其退出，释放管道和文件描述符。"""
+        if not self._started:
+            return
+        self._cancel_io()
+        await asyncio.gather(*self._drain_tasks, return_exceptions=True)
+        self._drain_tasks = []
+        if self._process.returncode is None:
+            self._process.terminate()
+            try:
+                await asyncio.wait_for(self._process.wait(), 2.0)
+            except asyncio.TimeoutError:
+                self._process.kill()  # 未在时限内退出则强制结束
+                await self._process.wait()
+        if self._process.stdin:
+            self._process.stdin.close()
+            await self._process.stdin.wait_closed()
+        self._started = False
+
+    async def _settle_output(self):
+        """
+        结束标记到达时，命令的输出已全部写入管道，但可能还未被后台任务读入缓冲区；
+        让出事件循环直到缓冲区不再增长。
+        """
+        while True:
+            size = len(self._stdout_buf) + len(self._stderr_buf)
+            await asyncio.sleep(0)  # 管道数据进入流
+            await asyncio.sleep(0)  # 后台任务把数据追加到缓冲区
+            if len(self._stdout_buf) + len(self._stderr_buf) == size:
+                return
+
     async def run(self, command: str):
         """在bash shell中执行命令。"""
         if not self._started:
@@ -66,50 +143,43 @@ class _BashSession:
                 f"超时：bash在 {self._timeout} 秒内未返回，必须重启",
             )
 
-        # 确认标准输入、输出和错误不是None，因为我们用PIPE创建了进程
+        # 确认标准输入不是None，因为我们用PIPE创建了进程
         assert self._process.stdin
-        assert self._process.stdout
-        assert self._process.stderr
+        assert self._done_reader
 
         # 向进程发送命令，并添加结束标记
-        self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
-        )
+        self._process.stdin.write(command.encode() + self._done_signal.encode())
         await self._process.stdin.drain()  # 等待数据写入完成
 
-        # 读取进程输出，直到找到结束标记
+        # 只需等待结束标记管道上的一行，与命令输出量无关
         try:
             async with asyncio.timeout(self._timeout):
-                while True:
-                    await asyncio.sleep(self._output_delay)  # 等待一段时间
-                    # 直接从stdout/stderr读取会永远等待EOF，使用StreamReader缓冲区直接读取
-                    output = (
-                        self._process.stdout._buffer.decode()
-                    )  # 忽略属性访问警告
-                    if self._sentinel in output:
-                        # 找到结束标记，截断并退出循环
-                        output = output[: output.index(self._sentinel)]
-                        break
+                done = await self._done_reader.readline()
+                if not done:
+                    # bash 已退出（例如执行了 exit）
+                    await self._process.wait()
+                    return CLIResult(
+                        system="tool must be restarted",
+                        error=f"bash has exited with returncode {self._process.returncode}",
+                    )
+                await self._settle_output()
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
                 f"超时：bash在 {self._timeout} 秒内未返回，必须重启",
             ) from None
 
-        # 处理输出和错误信息
+        # 处理输出和错误信息，输出只在最后解码一次
+        output = self._stdout_buf.decode(errors="replace")
+        self._stdout_buf.clear()  # 清空缓冲区，以便下次读取
         if output.endswith("\n"):
             output = output[:-1]
 
-        error = (
-            self._process.stderr._buffer.decode()
-        )  # 忽略属性访问警告
+        error = self._stderr_buf.decode(errors="replace")
+        self._stderr_buf.clear()
         if error.endswith("\n"):
             error = error[:-1]
 
-        # 清空缓冲区，以便下次读取
-        self._process.stdout._buffer.clear()  # 忽略属性访问警告
-        self._process.stderr._buffer.clear()  # 忽略属性访问警告
-
         return CLIResult(output=output, error=error)  # 返回命令执行结果
 
 
@@ -136,7 +206,7 @@ class Bash(BaseTool):
     ) -> CLIResult:
         if restart:
             if self._session:
-                self._session.stop()  # 如果会话存在，则停止
+                await self._session.aclose()  # 如果会话存在，则关闭并等待进程退出
             self._session = _BashSession()  # 创建新的会话
             await self._session.start()  # 启动会话
 
@@ -151,8 +221,24 @@ class Bash(BaseTool):
 
         raise ToolError("未提供命令。")  # 如果没有命令，则抛出异常
 
+    async def aclose(self):
+        """关闭bash会话。"""
+        if self._session:
+            await self._session.aclose()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
 
 if __name__ == "__main__":
-    bash = Bash()  # 创建Bash工具实例
-    rst = asyncio.run(bash.execute("ls -l"))  # 执行ls -l命令
+
+    async def _main():
+        async with Bash() as bash:  # 创建Bash工具实例，退出时关闭会话
+            return await bash.execute("ls -l")  # 执行ls -l命令
+
+    rst = asyncio.run(_main())
     print(rst)  # 打印执行结果
@@ -2,7 +2,7 @@
 
 import asyncio
 from pathlib import Path
-from typing import Optional, Protocol, Tuple, Union, runtime_checkable
+from typing import Dict, List, Optional, Protocol, Tuple, Union, runtime_checkable
 
 from app.config import SandboxSettings
 from app.exceptions import ToolError
@@ -156,3 +156,49 @@ class SandboxFileOperator(FileOperator):
             ) from exc
         except Exception as exc:
             return 1, "", f"Error executing command in sandbox: {str(exc)}"
+
+
+class BatchFileWriter:
+    """Queue many small local file writes and flush them concurrently."""
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+        self._pending: Dict[Path, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, path: PathLike, content: str) -> None:
+        """Queue a write; a later write to the same path replaces the earlier one."""
+        self._pending[Path(path)] = content
+
+    def _write(self, path: Path, content: str) -> None:
+        # Runs in a worker thread: open, write and close in one dispatch
+        with open(path, "w", encoding=self.encoding) as f:
+            f.write(content)
+
+    @staticmethod
+    def _make_dirs(directories) -> None:
+        for directory in directories:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    async def flush(self) -> List[Path]:
+        """Write all queued files and return their paths in queue order."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return []
+
+        # Create each parent directory once instead of once per file
+        await asyncio.to_thread(self._make_dirs, {path.parent for path in pending})
+
+        # Fan the writes out over the default thread pool; file I/O releases the GIL
+        try:
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(self._write, path, content)
+                    for path, content in pending.items()
+                )
+            )
+        except Exception as e:
+            raise ToolError(f"Failed to write files: {str(e)}") from None
+        return list(pending)
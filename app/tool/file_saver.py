@@ -53,10 +53,10 @@ The tool accepts content and a file path, and saves the content to that location
             else:
                 full_path = os.path.join(WORKSPACE_ROOT, file_path)
 
-            # 确保目录存在，如果不存在则创建
+            # 确保目录存在（exist_ok 一次调用完成检查与创建，避免先查后建的竞态）
             directory = os.path.dirname(full_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
 
             # 异步写入文件
             async with aiofiles.open(full_path, mode, encoding="utf-8") as file:
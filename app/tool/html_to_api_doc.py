@@ -1,15 +1,106 @@
+import asyncio
 import os
+import random
 import re
 import json
+import string
 import time
-from typing import Dict, List, Optional, Tuple, Any
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple
+
+import aiofiles
 
 from app.tool.base import BaseTool, ToolResult  # 从基础工具类导入
+from app.tool.json_repair import repair_json  # LLM输出JSON的格式修复
+from app.utils.json import dumps as _json_dumps, dumps_bytes as _json_dumps_bytes
 from app.logger import logger  # 导入日志记录器
 from app.config import config  # 导入配置模块
 from app.llm import LLM  # 导入LLM模块
 
 
+# LLM 响应解析用到的正则，在模块加载时编译一次
+_JSON_BLOCK_RE = re.compile(r'```json\s*([\s\S]*?)\s*```')
+_JSON_BLOCK_OPEN_RE = re.compile(r'```json\s')
+_FENCE_TAIL_CHARS = len("```json")  # 流式扫描时保留的上一段末尾长度，足以匹配被拆开的标记
+_MD_BLOCK_RE = re.compile(r'```markdown\s*([\s\S]*?)\s*```')
+_DOC_HEADER_RE = re.compile(r'# .* API接口文档')
+_LOG_HEAD_CHARS = 256  # 日志中长文本保留的开头字符数
+_LOG_TAIL_CHARS = 256  # 日志中长文本保留的结尾字符数
+_JSON_DECODER = json.JSONDecoder()  # raw_decode 解析响应中第一个完整的JSON对象，忽略其后的文字
+_FUSED_DOC_MARKER = "===API_DOC==="  # 合并模式中JSON与Markdown文档之间的分隔行
+_HTML_CACHE_SIZE = 8  # HTML内容缓存的最大文件数
+
+# HTML精简：去掉脚本、样式、SVG、注释等与界面功能无关的内容，只保留标签骨架、文本和少量属性
+_HTML_DROP_BLOCK_RE = re.compile(r'<(script|style|svg|noscript|template)\b[^>]*>[\s\S]*?</\1\s*>', re.IGNORECASE)
+_HTML_COMMENT_RE = re.compile(r'<!--[\s\S]*?-->')
+_HTML_DOCTYPE_RE = re.compile(r'<!DOCTYPE[^>]*>|<\?xml[^>]*\?>', re.IGNORECASE)
+_HTML_HEAD_NOISE_RE = re.compile(r'<(?:meta|link|base)\b[^>]*>', re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r'<([a-zA-Z][\w-]*)((?:\s[^<>]*?)?)\s*(/?)>')
+_HTML_ATTR_RE = re.compile(r'([^\s=/<>"\']+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s"\'>]+))?')
+_HTML_WS_RE = re.compile(r'\s+')
+_HTML_GAP_RE = re.compile(r'>\s+<')
+_HTML_KEEP_ATTRS = frozenset((
+    "id", "class", "name", "type", "placeholder", "value", "href", "action", "method",
+    "for", "title", "alt", "role", "aria-label", "required", "disabled", "checked",
+    "selected", "multiple", "min", "max", "maxlength", "pattern", "onclick", "onsubmit", "onchange",
+))
+
+
+def _condense_attrs(match: "re.Match") -> str:
+    """只保留与界面功能相关的属性（白名单及 data-*），丢弃样式和内联图片等"""
+    tag, attrs, self_closing = match.group(1), match.group(2), match.group(3)
+    kept = []
+    for name, value in _HTML_ATTR_RE.findall(attrs):
+        lower = name.lower()
+        if lower in _HTML_KEEP_ATTRS or lower.startswith("data-"):
+            if value.startswith(("\"data:", "'data:")):
+                continue
+            kept.append(f"{name}={value}" if value else name)
+    if kept:
+        return f"<{tag} {' '.join(kept)}{self_closing}>"
+    return f"<{tag}{self_closing}>"
+
+
+@lru_cache(maxsize=_HTML_CACHE_SIZE)
+def _condense_html(html: str) -> str:
+    """精简HTML后再放入提示词，显著减少输入令牌数；同一份HTML只精简一次"""
+    html = _HTML_DROP_BLOCK_RE.sub("", html)
+    html = _HTML_COMMENT_RE.sub("", html)
+    html = _HTML_DOCTYPE_RE.sub("", html)
+    html = _HTML_HEAD_NOISE_RE.sub("", html)
+    html = _HTML_TAG_RE.sub(_condense_attrs, html)
+    html = _HTML_WS_RE.sub(" ", html)
+    return _HTML_GAP_RE.sub("><", html).strip()
+
+
+def _compile_template(template: str) -> Tuple[Tuple[str, Optional[str], str], ...]:
+    """把 str.format 模板预先拆分为 (静态文本, 占位符名, 格式说明) 片段，只解析一次"""
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        assert conversion is None, "提示词模板不支持 !r/!s 转换"
+        parts.append((literal, field, spec or ""))
+    return tuple(parts)
+
+
+def _render_template(parts: Tuple[Tuple[str, Optional[str], str], ...], **values: Any) -> str:
+    """按预先拆分的片段拼接提示词，结果与 template.format(**values) 相同"""
+    out: List[str] = []
+    for literal, field, spec in parts:
+        out.append(literal)
+        if field is not None:
+            value = values[field]
+            out.append(value if type(value) is str and not spec else format(value, spec))
+    return "".join(out)
+
+
+def _truncate(text: str, head: int = _LOG_HEAD_CHARS, tail: int = _LOG_TAIL_CHARS) -> str:
+    """长文本写日志前只保留首尾，避免大段输出拖慢事件循环"""
+    if len(text) <= head + tail + 20:
+        return text
+    return f"{text[:head]}...[省略{len(text) - head - tail}字符]...{text[-tail:]}"
+
+
 class HTMLToAPIDoc(BaseTool):
     """一个根据HTML原型界面和文字描述生成前端使用的API接口文档的工具。"""
 
@@ -45,6 +136,9 @@ class HTMLToAPIDoc(BaseTool):
         "required": ["html_path", "project_name"],
     }
 
+    fuse_steps: bool = False  # 为真时三个步骤合并为一次LLM调用；默认保留分步流程
+    condense_html: bool = True  # 为真时先精简HTML（去掉脚本、样式、注释等）再放入提示词
+
     # 步骤1：分析提示词 - 分析HTML原型和文字描述，确定功能和所需接口数量
     _analyze_features_prompt = """请分析下面的HTML原型界面和文字描述，提取所有功能点并确定需要实现的API接口数量。
 
@@ -183,17 +277,88 @@ API规划结果:
 8. 数据模型/实体定义（如适用）
 """
 
+    # 合并模式提示词 - 一次调用完成功能分析、API规划和文档生成，HTML只发送一次
+    _fused_prompt = """请分析下面的HTML原型界面和文字描述，一次性完成功能分析、API接口规划，并生成完整的API接口文档。
+
+项目名称: {project_name}
+
+{description_section}
+
+HTML原型界面:
+```html
+{html_content}
+```
+
+请按顺序输出两部分内容：
+
+第一部分：一个JSON代码块，包含功能分析（analysis）和API规划（plan）：
+```json
+{{
+  "analysis": {{
+    "features": [
+      {{
+        "name": "功能名称",
+        "description": "功能描述",
+        "apis": [{{"purpose": "接口用途描述", "suggested_path": "/api/建议路径"}}]
+      }}
+    ],
+    "total_apis": 接口总数量,
+    "authentication_required": true/false,
+    "data_entities": ["实体1", "实体2"]
+  }},
+  "plan": {{
+    "api_base_path": "/api",
+    "authentication": {{
+      "type": "认证类型（如JWT、OAuth等）",
+      "endpoints": [{{"path": "/auth/login", "method": "POST", "description": "用户登录接口"}}]
+    }},
+    "apis": [
+      {{
+        "path": "/api/完整路径",
+        "method": "HTTP方法",
+        "feature": "所属功能",
+        "description": "接口描述",
+        "request_params": ["参数1", "参数2"],
+        "response_entities": ["返回实体1", "返回实体2"]
+      }}
+    ]
+  }}
+}}
+```
+
+第二部分：在JSON代码块之后单独输出一行 {doc_marker}，随后以Markdown格式输出完整的API文档。文档必须覆盖第一部分规划的所有接口，并包含：
+1. 标题和简介
+2. 目录
+3. 接口规范（包括请求/响应格式，状态码等）
+4. 认证与授权机制
+5. 完整的接口列表（按功能模块分组）
+6. 每个接口的详细说明（包括URL、方法、参数、响应等）
+7. 错误码说明
+8. 数据模型/实体定义（如适用）
+
+请确保分析全面、不遗漏任何功能点，API设计符合RESTful规范。
+"""
+
+    # 提示词模板在类定义时拆分好，生成提示词时直接拼接，不必每次解析格式串
+    _analyze_features_tpl: ClassVar[tuple] = _compile_template(_analyze_features_prompt)
+    _plan_apis_tpl: ClassVar[tuple] = _compile_template(_plan_apis_prompt)
+    _generate_api_doc_tpl: ClassVar[tuple] = _compile_template(_generate_api_doc_prompt)
+    _fused_tpl: ClassVar[tuple] = _compile_template(_fused_prompt)
+
     def __init__(self):
         super().__init__()
         self._progress = 0
         self._total_steps = 3  # 总步骤数：1.分析功能 2.规划API 3.生成文档
+        self._llm: Optional[LLM] = None  # 各步骤及重试共用的LLM实例
+        self._ensured_dirs: set = set()  # 已确认存在的输出目录，避免重复创建
+        self._html_cache: OrderedDict = OrderedDict()  # 路径 -> (mtime, size, 内容)，LRU
 
     def _update_progress(self, step: int, message: str) -> None:
         """更新进度并输出信息"""
         self._progress = (step / self._total_steps) * 100
         logger.info(f"进度: {self._progress:.1f}% - {message}")
 
-    def _read_html_file(self, html_path: str) -> str:
+    async def _read_html_file(self, html_path: str) -> str:
         """读取HTML文件内容"""
         # 确定完整路径
         if os.path.isabs(html_path):
@@ -201,15 +366,29 @@ API规划结果:
         else:
             full_path = os.path.join(config.workspace_root, html_path)
 
-        # 检查文件是否存在
-        if not os.path.exists(full_path):
+        # 检查文件是否存在，同时取得修改时间和大小用于校验缓存
+        try:
+            st = await asyncio.to_thread(os.stat, full_path)
+        except FileNotFoundError:
             raise FileNotFoundError(f"HTML文件未找到: {full_path}")
 
-        # 读取文件内容
-        with open(full_path, "r", encoding="utf-8") as f:
-            return f.read()
+        # 文件未修改时直接返回缓存内容
+        cached = self._html_cache.get(full_path)
+        if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            self._html_cache.move_to_end(full_path)
+            return cached[2]
+
+        # 读取文件内容（不阻塞事件循环）
+        async with aiofiles.open(full_path, "r", encoding="utf-8") as f:
+            content = await f.read()
 
-    def _create_output_dir(self, output_path: str) -> str:
+        self._html_cache[full_path] = (st.st_mtime, st.st_size, content)
+        self._html_cache.move_to_end(full_path)
+        if len(self._html_cache) > _HTML_CACHE_SIZE:
+            self._html_cache.popitem(last=False)
+        return content
+
+    async def _create_output_dir(self, output_path: str) -> str:
         """创建输出目录"""
         # 确定完整输出路径
         if os.path.isabs(output_path):
@@ -217,68 +396,80 @@ API规划结果:
         else:
             full_output_path = os.path.join(config.workspace_root, output_path)
 
-        # 创建目录
-        os.makedirs(full_output_path, exist_ok=True)
+        # 创建目录（同一目录只创建一次，多个保存操作共用）
+        if full_output_path not in self._ensured_dirs:
+            await asyncio.to_thread(os.makedirs, full_output_path, exist_ok=True)
+            self._ensured_dirs.add(full_output_path)
 
         return full_output_path
 
-    def _save_markdown_file(self, content: str, output_path: str, filename: str) -> str:
+    async def _save_markdown_file(self, content: str, output_path: str, filename: str) -> str:
         """保存Markdown文件"""
         # 确保目录存在
-        output_dir = self._create_output_dir(output_path)
+        output_dir = await self._create_output_dir(output_path)
 
         # 确定文件路径
         file_path = os.path.join(output_dir, f"{filename}.md")
 
         # 写入文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
+            await f.write(content)
 
         return file_path
 
-    def _save_json_file(self, content: Dict, output_path: str, filename: str) -> str:
+    async def _save_json_file(self, content: Dict, output_path: str, filename: str) -> str:
         """保存JSON中间结果文件"""
         # 确保目录存在
-        output_dir = self._create_output_dir(output_path)
+        output_dir = await self._create_output_dir(output_path)
 
         # 确定文件路径
         file_path = os.path.join(output_dir, f"{filename}.json")
 
         # 写入文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(content, f, ensure_ascii=False, indent=2)
+        async with aiofiles.open(file_path, "wb") as f:
+            await f.write(_json_dumps_bytes(content, indent=True))
 
         return file_path
 
-    async def _execute_llm_step(self, prompt: str, step_name: str, max_retries: int = 3) -> str:
-        """执行LLM调用步骤，带重试机制，提取JSON或Markdown内容"""
+    async def _execute_llm_step(
+        self,
+        prompt: str,
+        step_name: str,
+        max_retries: int = 3,
+        parser: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """执行LLM调用步骤，带重试机制，提取JSON或Markdown内容；提供 parser 时由其解析完整响应"""
         logger.info(f"执行步骤: {step_name}，最大重试次数: {max_retries}")
 
         for retry in range(max_retries):
             try:
-                # 创建LLM实例
-                llm = LLM("doubao")
+                # 复用同一个LLM实例（首次使用时创建）
+                if self._llm is None:
+                    self._llm = LLM("doubao")
+                llm = self._llm
 
                 logger.info(f"正在执行{step_name} (尝试 {retry+1}/{max_retries})...")
                 start_time = time.time()
 
-                # 使用LLM生成内容
-                messages = [{"role": "user", "content": prompt}]
-                response = await llm.ask(messages, stream=False)
+                # 使用LLM流式生成内容；JSON步骤在代码块闭合时即停止生成
+                expects_json = parser is None and (step_name == "功能接口分析(步骤1)" or step_name == "API接口规划(步骤2)" or "json" in step_name.lower())
+                response = await self._ask_stream(llm, prompt, stop_at_json_fence=expects_json)
 
                 # 计算耗时
                 duration = time.time() - start_time
                 logger.info(f"{step_name}完成，耗时: {duration:.2f}秒，生成内容长度: {len(response)}字符")
 
                 # 根据步骤名判断应该返回的内容类型
-                if step_name == "功能接口分析(步骤1)" or step_name == "API接口规划(步骤2)" or "json" in step_name.lower():
+                if parser is not None:
+                    return parser(response)
+                if expects_json:
                     # 尝试提取JSON内容
                     try:
                         json_content = self._extract_json_content(response)
-                        logger.info(f"成功提取JSON内容，键: {list(json_content.keys())}")
+                        logger.opt(lazy=True).info("成功提取JSON内容，键: {}", lambda: _truncate(str(list(json_content.keys()))))
                         return json_content
                     except Exception as e:
-                        logger.error(f"JSON提取失败: {str(e)}，尝试重新生成")
+                        logger.error(f"JSON提取失败: {_truncate(str(e))}，尝试重新生成")
                         raise ValueError(f"无法从响应中提取有效的JSON数据: {str(e)}")
                 else:
                     # 尝试提取Markdown内容
@@ -287,37 +478,79 @@ API规划结果:
                     return markdown_content
 
             except Exception as e:
-                logger.error(f"{step_name}失败 (尝试 {retry+1}/{max_retries}): {str(e)}")
+                logger.error(f"{step_name}失败 (尝试 {retry+1}/{max_retries}): {_truncate(str(e))}")
 
                 if retry == max_retries - 1:
                     raise RuntimeError(f"{step_name}失败，已重试{max_retries}次: {str(e)}")
 
-                # 等待后重试
-                import asyncio
-                await asyncio.sleep(1)
+                # 指数退避加随机抖动后重试，避免并发请求同时重试
+                await asyncio.sleep(min(8.0, (2 ** retry) * 0.5) + random.uniform(0, 0.25))
 
         raise RuntimeError(f"{step_name}失败，超过最大重试次数")
 
+    async def _ask_stream(self, llm: LLM, prompt: str, stop_at_json_fence: bool) -> str:
+        """
+        流式获取LLM响应。stop_at_json_fence 为真时，```json 代码块一闭合就停止生成，
+        之后的文字说明不再等待；Markdown 文档中可能嵌套代码块，因此完整接收。
+        """
+        messages = [{"role": "user", "content": prompt}]
+        parts: List[str] = []
+        seen = 0  # 已接收的字符数
+        tail = ""  # 上一段末尾的几个字符，处理代码块标记被拆在两段中的情况
+        body_start = -1  # ```json 之后内容在完整响应中的起始位置
+        stream = llm.ask_stream(messages)
+        try:
+            async for delta in stream:
+                parts.append(delta)
+                if not stop_at_json_fence:
+                    continue
+                # 只扫描新到达的内容（连同上一段的末尾），不重复拼接整个响应
+                window = tail + delta
+                window_start = seen - len(tail)
+                seen += len(delta)
+                if body_start < 0:
+                    match = _JSON_BLOCK_OPEN_RE.search(window)
+                    if match:
+                        body_start = window_start + match.end()
+                if body_start >= 0:
+                    close = window.find("```", max(body_start - window_start, 0))
+                    if close >= 0:
+                        return "".join(parts)[: window_start + close + 3]
+                tail = window[-_FENCE_TAIL_CHARS:]
+        finally:
+            await stream.aclose()
+
+        response = "".join(parts).strip()
+        if not response:
+            raise ValueError("Empty response from streaming LLM")
+        return response
+
     def _extract_json_content(self, response: str) -> Dict:
         """从响应中提取JSON内容"""
         # 提取JSON内容
-        json_match = re.search(r'```json\s*([\s\S]*?)\s*```', response)
+        json_match = _JSON_BLOCK_RE.search(response)
         if json_match:
             json_content = json_match.group(1).strip()
         else:
-            # 尝试直接从响应中解析JSON
+            # 尝试直接从响应中解析JSON：从第一个 { 开始解析，后面的说明文字中即使有 } 也不受影响
             json_start = response.find('{')
+            if json_start == -1:
+                raise ValueError("无法从响应中提取JSON内容")
+            try:
+                return _JSON_DECODER.raw_decode(response, json_start)[0]
+            except json.JSONDecodeError:
+                pass
+            # 解析失败时截取到最后一个 }，交给下面的修复流程
             json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end != -1:
-                json_content = response[json_start:json_end]
-            else:
+            if json_end <= json_start:
                 raise ValueError("无法从响应中提取JSON内容")
+            json_content = response[json_start:json_end]
 
         # 尝试解析JSON
         try:
             return json.loads(json_content)
         except json.JSONDecodeError as e:
-            logger.error(f"JSON解析失败: {str(e)}")
+            logger.error(f"JSON解析失败: {_truncate(str(e))}")
 
             # 尝试修复常见的JSON问题
             fixed_content = self._fix_json_content(json_content)
@@ -328,30 +561,56 @@ API规划结果:
 
     def _fix_json_content(self, json_content: str) -> str:
         """尝试修复常见的JSON格式问题"""
-        # 修复未加引号的键名
-        fixed = re.sub(r'([{,]\s*)(\w+)(\s*:)', r'\1"\2"\3', json_content)
-        # 修复末尾多余的逗号
-        fixed = re.sub(r',\s*}', '}', fixed)
-        fixed = re.sub(r',\s*]', ']', fixed)
-        # 修复错误的单引号
-        fixed = fixed.replace("'", '"')
-        return fixed
+        return repair_json(json_content)
 
     def _extract_markdown_content(self, response: str) -> str:
         """从响应中提取Markdown内容"""
         # 尝试提取Markdown代码块
-        markdown_match = re.search(r'```markdown\s*([\s\S]*?)\s*```', response)
+        markdown_match = _MD_BLOCK_RE.search(response)
         if markdown_match:
             return markdown_match.group(1).strip()
 
         # 如果没有Markdown标记，尝试提取文档内容
-        doc_start = re.search(r'# .* API接口文档', response)
+        doc_start = _DOC_HEADER_RE.search(response)
         if doc_start:
             return response[doc_start.start():]
 
         # 如果没有明确标记，返回整个响应
         return response
 
+    def _parse_fused_response(self, response: str) -> Tuple[Dict, Dict, str]:
+        """解析合并模式的响应：标记行之前为分析/规划JSON，之后为Markdown文档"""
+        head, sep, doc = response.partition(_FUSED_DOC_MARKER)
+        if not sep:
+            raise ValueError(f"响应中缺少文档分隔标记 {_FUSED_DOC_MARKER}")
+        envelope = self._extract_json_content(head)
+        analysis_result = envelope.get("analysis")
+        api_plan = envelope.get("plan")
+        if not isinstance(analysis_result, dict) or not isinstance(api_plan, dict):
+            raise ValueError("JSON中缺少 analysis 或 plan 部分")
+        return analysis_result, api_plan, self._extract_markdown_content(doc.strip())
+
+    async def _execute_fused(self, html_content: str, project_name: str, description_text: str = "") -> Tuple[Dict, Dict, str]:
+        """合并模式：一次LLM调用同时得到功能分析、API规划和API文档"""
+        description_section = ""
+        if description_text:
+            description_section = f"""项目需求描述:
+```
+{description_text}
+```
+"""
+
+        prompt = _render_template(
+            self._fused_tpl,
+            project_name=project_name,
+            description_section=description_section,
+            html_content=html_content,
+            doc_marker=_FUSED_DOC_MARKER,
+        )
+        return await self._execute_llm_step(
+            prompt, "API文档合并生成", max_retries=4, parser=self._parse_fused_response
+        )
+
     async def _analyze_features(self, html_content: str, project_name: str, description_text: str = "") -> Dict:
         """步骤1: 分析HTML原型和文字描述，确定功能和所需接口"""
         # 构建描述部分
@@ -364,7 +623,8 @@ API规划结果:
 """
 
         # 构建提示词
-        prompt = self._analyze_features_prompt.format(
+        prompt = _render_template(
+            self._analyze_features_tpl,
             project_name=project_name,
             description_section=description_section,
             html_content=html_content
@@ -374,8 +634,15 @@ API规划结果:
         analysis_result = await self._execute_llm_step(prompt, "功能接口分析(步骤1)", max_retries=3)
         return analysis_result
 
-    async def _plan_apis(self, html_content: str, project_name: str, analysis_result: Dict, description_text: str = "") -> Dict:
-        """步骤2: 基于功能分析，规划所有API接口"""
+    async def _plan_apis(
+        self,
+        html_content: str,
+        project_name: str,
+        analysis_result: Dict,
+        description_text: str = "",
+        analysis_json: Optional[str] = None,
+    ) -> Dict:
+        """步骤2: 基于功能分析，规划所有API接口；analysis_json 为已序列化的分析结果，提供时直接复用"""
         # 构建描述部分
         description_section = ""
         if description_text:
@@ -386,9 +653,10 @@ API规划结果:
 """
 
         # 构建提示词
-        prompt = self._plan_apis_prompt.format(
+        prompt = _render_template(
+            self._plan_apis_tpl,
             project_name=project_name,
-            analysis_result=json.dumps(analysis_result, ensure_ascii=False, indent=2),
+            analysis_result=analysis_json if analysis_json is not None else _json_dumps(analysis_result),
             description_section=description_section,
             html_content=html_content
         )
@@ -397,8 +665,16 @@ API规划结果:
         api_plan = await self._execute_llm_step(prompt, "API接口规划(步骤2)", max_retries=3)
         return api_plan
 
-    async def _generate_api_doc(self, project_name: str, analysis_result: Dict, api_plan: Dict, description_text: str = "") -> str:
-        """步骤3: 生成详细API文档"""
+    async def _generate_api_doc(
+        self,
+        project_name: str,
+        analysis_result: Dict,
+        api_plan: Dict,
+        description_text: str = "",
+        analysis_json: Optional[str] = None,
+        plan_json: Optional[str] = None,
+    ) -> str:
+        """步骤3: 生成详细API文档；analysis_json、plan_json 为已序列化的中间结果，提供时直接复用"""
         # 构建描述部分
         description_section = ""
         if description_text:
@@ -414,10 +690,11 @@ API规划结果:
             total_apis += len(api_plan["authentication"]["endpoints"])
 
         # 构建提示词
-        prompt = self._generate_api_doc_prompt.format(
+        prompt = _render_template(
+            self._generate_api_doc_tpl,
             project_name=project_name,
-            analysis_result=json.dumps(analysis_result, ensure_ascii=False, indent=2),
-            api_plan=json.dumps(api_plan, ensure_ascii=False, indent=2),
+            analysis_result=analysis_json if analysis_json is not None else _json_dumps(analysis_result),
+            api_plan=plan_json if plan_json is not None else _json_dumps(api_plan),
             description_section=description_section,
             total_apis=total_apis
         )
@@ -447,6 +724,7 @@ API规划结果:
         返回:
             ToolResult: 包含文档生成路径和操作状态的结果对象。
         """
+        saves: List[asyncio.Task] = []  # 后台保存中间结果的任务，无论成功与否都在结束前等待完成
         try:
             # 初始化进度
             self._progress = 0
@@ -470,9 +748,14 @@ API规划结果:
                 output_filename = f"{project_name}_api_doc"
 
             # 读取HTML文件内容
-            html_content = self._read_html_file(html_path)
+            html_content = await self._read_html_file(html_path)
             logger.info(f"已读取HTML文件，大小: {len(html_content)}字节")
 
+            # 精简HTML，减少提示词长度
+            if self.condense_html:
+                html_content = _condense_html(html_content)
+                logger.info(f"已精简HTML内容，精简后大小: {len(html_content)}字节")
+
             # 记录是否提供了描述文本
             if description_text:
                 logger.info(f"提供了项目描述文本，长度: {len(description_text)}字节")
@@ -482,41 +765,72 @@ API规划结果:
             # 步骤1: 分析功能和所需接口
             self._update_progress(0.3, "步骤1: 分析功能和所需接口...")
             start_time = time.time()
-            analysis_result = await self._analyze_features(html_content, project_name, description_text)
+            if self.fuse_steps:
+                # 合并模式：一次调用得到全部结果，步骤2、3直接使用
+                analysis_result, fused_plan, fused_doc = await self._execute_fused(html_content, project_name, description_text)
+            else:
+                analysis_result = await self._analyze_features(html_content, project_name, description_text)
             step1_duration = time.time() - start_time
 
-            # 保存步骤1结果
-            analysis_file = self._save_json_file(analysis_result, output_path, f"{project_name}_api_analysis")
+            # 保存步骤1结果（与下一步的LLM调用并行进行）
+            save_analysis = asyncio.create_task(
+                self._save_json_file(analysis_result, output_path, f"{project_name}_api_analysis")
+            )
+            saves.append(save_analysis)
 
             # 统计信息
             feature_count = len(analysis_result.get("features", []))
             total_apis = analysis_result.get("total_apis", 0)
             logger.info(f"步骤1完成 - 分析出{feature_count}个功能，预计需要{total_apis}个API接口，耗时: {step1_duration:.2f}秒")
-            logger.info(f"分析结果已保存到: {analysis_file}")
 
             # 步骤2: 规划API接口
             self._update_progress(1, "步骤2: 规划API接口...")
             start_time = time.time()
-            api_plan = await self._plan_apis(html_content, project_name, analysis_result, description_text)
+            if self.fuse_steps:
+                api_plan = fused_plan
+            else:
+                # 分析结果只序列化一次，步骤2、3的提示词共用
+                analysis_json = _json_dumps(analysis_result)
+                api_plan = await self._plan_apis(
+                    html_content, project_name, analysis_result, description_text, analysis_json=analysis_json
+                )
             step2_duration = time.time() - start_time
 
-            # 保存步骤2结果
-            plan_file = self._save_json_file(api_plan, output_path, f"{project_name}_api_plan")
+            # 保存步骤2结果（与下一步的LLM调用并行进行）
+            save_plan = asyncio.create_task(
+                self._save_json_file(api_plan, output_path, f"{project_name}_api_plan")
+            )
+            saves.append(save_plan)
 
             # 统计信息
             api_count = len(api_plan.get("apis", []))
             auth_endpoints = len(api_plan.get("authentication", {}).get("endpoints", []))
             logger.info(f"步骤2完成 - 规划了{api_count}个API接口和{auth_endpoints}个认证接口，耗时: {step2_duration:.2f}秒")
-            logger.info(f"API规划已保存到: {plan_file}")
 
             # 步骤3: 生成API文档
             self._update_progress(2, "步骤3: 生成完整API文档...")
             start_time = time.time()
-            api_doc_content = await self._generate_api_doc(project_name, analysis_result, api_plan, description_text)
+            if self.fuse_steps:
+                api_doc_content = fused_doc
+            else:
+                api_doc_content = await self._generate_api_doc(
+                    project_name,
+                    analysis_result,
+                    api_plan,
+                    description_text,
+                    analysis_json=analysis_json,
+                    plan_json=_json_dumps(api_plan),
+                )
             step3_duration = time.time() - start_time
 
-            # 保存最终文档
-            doc_file = self._save_markdown_file(api_doc_content, output_path, output_filename)
+            # 保存最终文档，并等待中间结果保存完成
+            analysis_file, plan_file, doc_file = await asyncio.gather(
+                save_analysis,
+                save_plan,
+                self._save_markdown_file(api_doc_content, output_path, output_filename),
+            )
+            logger.info(f"分析结果已保存到: {analysis_file}")
+            logger.info(f"API规划已保存到: {plan_file}")
 
             # 计算总耗时
             total_duration = step1_duration + step2_duration + step3_duration
@@ -553,10 +867,15 @@ API规划结果:
             )
 
         except Exception as e:
-            logger.error(f"API文档生成失败: {str(e)}")
+            logger.error(f"API文档生成失败: {_truncate(str(e))}")
             import traceback
             logger.error(f"详细错误: {traceback.format_exc()}")
             return ToolResult(
                 error=f"API文档生成失败: {str(e)}",
                 success=False,
             )
+
+        finally:
+            # 后续步骤出错时，仍等待已启动的保存任务结束并取回其异常
+            if saves:
+                await asyncio.gather(*saves, return_exceptions=True)
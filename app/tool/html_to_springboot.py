@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 import re
 import zipfile
@@ -7,11 +9,263 @@ import time
 from typing import Dict, List, Optional, Union, Tuple
 
 from app.tool.base import BaseTool, ToolResult  # 从基础工具类导入
+from app.tool.file_operators import BatchFileWriter  # 导入批量文件写入器
+from app.tool.json_repair import repair_json  # LLM输出JSON的格式修复
+from app.utils.json import dumps as _json_dumps, loads as _json_loads
 from app.logger import logger  # 导入日志记录器
 from app.config import config  # 导入配置模块
 from app.llm import LLM  # 导入LLM模块
 
 
+# LLM 响应中 ```json 代码块的正则，在模块加载时编译一次
+_JSON_FENCE_RE = re.compile(r'```json\s*([\s\S]*?)\s*```')
+
+
+class _JSONBlockScanner:
+    """
+    随流式响应增量扫描，定位 ```json 代码块中顶层JSON对象的起止位置。
+    对象闭合后即可停止接收，并直接解析这一段，无需对整个响应再做正则匹配。
+    """
+
+    _FENCE = "```json"
+
+    def __init__(self):
+        self.start: Optional[int] = None  # 顶层对象在完整响应中的起始偏移
+        self.end: Optional[int] = None  # 顶层对象结束后的偏移，非None表示对象已完整
+        self.skipped = False  # 代码块内容不是对象时为True，之后不再扫描
+        self._offset = 0  # 已接收的字符总数
+        self._tail = ""  # 尚未找到代码块标记时保留的末尾字符，处理标记被拆在两段中的情况
+        self._fenced = False
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> bool:
+        """扫描新到达的一段内容，返回顶层对象是否已完整；内容不是对象时始终返回False"""
+        if self.end is not None:
+            return True
+        if self.skipped:
+            return False
+        base = self._offset
+        self._offset += len(chunk)
+        text = chunk
+        if not self._fenced:
+            window = self._tail + chunk
+            idx = window.find(self._FENCE)
+            if idx == -1:
+                self._tail = window[-(len(self._FENCE) - 1):]
+                return False
+            self._fenced = True
+            skip = idx + len(self._FENCE)
+            base = base - len(self._tail) + skip
+            text = window[skip:]
+
+        i, n = 0, len(text)
+        while i < n:
+            if self._in_str:
+                # 字符串内部只需找下一个引号或反斜杠，大段文件内容直接跳过
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                quote = text.find('"', i)
+                backslash = text.find("\\", i)
+                if backslash != -1 and (quote == -1 or backslash < quote):
+                    self._escape = True
+                    i = backslash + 1
+                elif quote == -1:
+                    break
+                else:
+                    self._in_str = False
+                    i = quote + 1
+                continue
+            ch = text[i]
+            if ch == '"':
+                self._in_str = True
+            elif ch == "{" or ch == "[":
+                if self._depth == 0:
+                    if ch == "[":
+                        # 代码块内容不是对象：继续接收完整响应，交给完整解析处理
+                        self.skipped = True
+                        return False
+                    self.start = base + i
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = base + i + 1
+                    return True
+            i += 1
+        return False
+
+
+# 基础文件压缩：去掉注释、import、空行和缩进，折叠非访问器方法体，截断测试数据，
+# 减少第三阶段提示词中的无效令牌
+_JAVA_BLOCK_COMMENT_RE = re.compile(r'/\*[\s\S]*?\*/')
+_XML_COMMENT_RE = re.compile(r'<!--[\s\S]*?-->')
+_JAVA_METHOD_NAME_RE = re.compile(r'(\w+)\s*\([^()]*\)\s*(?:throws\s+[\w.,\s]+)?$')
+_ACCESSOR_PREFIXES = ("get", "set", "is")
+_SQL_INSERT_RE = re.compile(r'INSERT\s+INTO\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def _collapse_java_bodies(text: str) -> str:
+    """把类中非 getter/setter 方法的方法体替换为 ;，只保留方法签名"""
+    out: List[str] = []
+    depth = 0
+    i, n = 0, len(text)
+    last = 0  # 尚未输出的内容起点
+    while i < n:
+        ch = text[i]
+        if ch == '"' or ch == "'":
+            # 跳过字符串和字符字面量
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == "\\" else 1
+            i = j + 1
+            continue
+        if ch == "{":
+            if depth == 1:
+                # 类体中的 { ：判断前面是否为方法签名
+                line_start = max(text.rfind(";", 0, i), text.rfind("}", 0, i), text.rfind("{", 0, i)) + 1
+                match = _JAVA_METHOD_NAME_RE.search(text[line_start:i].strip())
+                if match and not match.group(1).startswith(_ACCESSOR_PREFIXES):
+                    # 找到匹配的 }，整个方法体替换为 ;
+                    out.append(text[last:i].rstrip())
+                    out.append(";")
+                    body_depth = 0
+                    while i < n:
+                        c = text[i]
+                        if c == '"' or c == "'":
+                            j = i + 1
+                            while j < n and text[j] != c:
+                                j += 2 if text[j] == "\\" else 1
+                            i = j + 1
+                            continue
+                        if c == "{":
+                            body_depth += 1
+                        elif c == "}":
+                            body_depth -= 1
+                            if body_depth == 0:
+                                break
+                        i += 1
+                    i += 1
+                    last = i
+                    continue
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        i += 1
+    out.append(text[last:])
+    return "".join(out)
+
+
+def _split_sql(text: str) -> List[str]:
+    """按语句拆分SQL并去掉 -- 注释，字符串中的分号和 -- 保持不变"""
+    statements: List[str] = []
+    parts: List[str] = []
+    in_str = False
+    start = 0
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "'":
+            in_str = not in_str  # 转义的 '' 会连续切换两次，不影响结果
+        elif in_str:
+            pass
+        elif ch == ";":
+            parts.append(text[start:i])
+            statements.append("".join(parts))
+            parts = []
+            start = i + 1
+        elif ch == "-" and text.startswith("--", i):
+            # 注释延续到行尾，保留换行符以免前后两行被拼接
+            parts.append(text[start:i])
+            end = text.find("\n", i)
+            start = i = n if end == -1 else end
+            continue
+        i += 1
+    parts.append(text[start:])
+    statements.append("".join(parts))
+    return statements
+
+
+def _first_values_row(values: str) -> Tuple[str, int]:
+    """返回 VALUES 之后的第一行数据及总行数"""
+    depth = 0
+    in_str = False
+    first_end = -1
+    rows = 0
+    for i, ch in enumerate(values):
+        if ch == "'":
+            in_str = not in_str
+        elif in_str:
+            continue
+        elif ch == "(":
+            if depth == 0:
+                rows += 1
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0 and first_end == -1:
+                first_end = i + 1
+    return (values[:first_end] if first_end != -1 else values), rows
+
+
+def _compact_sql(text: str) -> str:
+    """同一张表的多条测试数据只保留第一条，其余以注释标明数量"""
+    lines: List[str] = []
+    current_table = None
+    skipped = 0
+    # 拆分时已去掉注释，语句合并为一行后不会误注释后面的内容
+    for stmt in _split_sql(text):
+        stmt = " ".join(line.strip() for line in stmt.splitlines() if line.strip())
+        if not stmt:
+            continue
+        match = _SQL_INSERT_RE.match(stmt)
+        table = match.group(1).lower() if match else None
+        if table is not None and table == current_table:
+            skipped += 1
+            continue
+        if skipped:
+            lines.append(f"-- ({skipped} more rows)")
+            skipped = 0
+        current_table = table
+        values_at = stmt.upper().find("VALUES") if table is not None else -1
+        if values_at != -1:
+            # 多行 VALUES 只保留第一行
+            first_row, rows = _first_values_row(stmt[values_at + 6:])
+            if rows > 1:
+                lines.append(f"{stmt[:values_at + 6]} {first_row.strip()}; -- ({rows - 1} more rows)")
+                continue
+        lines.append(f"{stmt};")
+    if skipped:
+        lines.append(f"-- ({skipped} more rows)")
+    return "\n".join(lines)
+
+
+def _compact_basic_file(rel_path: str, content: str) -> str:
+    """按文件类型压缩基础文件内容，作为生成其余文件时的参考"""
+    if rel_path.endswith(".java"):
+        content = _JAVA_BLOCK_COMMENT_RE.sub("", content)
+        content = _collapse_java_bodies(content)
+        lines = (line.strip() for line in content.splitlines())
+        return "\n".join(
+            line for line in lines if line and not line.startswith(("//", "import "))
+        )
+    if rel_path.endswith(".sql"):
+        return _compact_sql(content)
+    if rel_path.endswith(".xml"):
+        content = _XML_COMMENT_RE.sub("", content)
+        return "\n".join(line.strip() for line in content.splitlines() if line.strip())
+    if rel_path.endswith((".yml", ".yaml", ".properties")):
+        # 缩进在YAML中有含义，只去掉注释行和空行
+        return "\n".join(
+            line.rstrip() for line in content.splitlines()
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+    return content
+
+
 class HTMLToSpringboot(BaseTool):
     """一个用于将HTML原型界面和API接口文档转换为Springboot+MyBatis后端项目的工具。"""
 
@@ -48,22 +302,20 @@ class HTMLToSpringboot(BaseTool):
                 "description": "Path where to save the generated project. Default is 'springboot_projects' folder in workspace.",
                 "default": "springboot_projects",
             },
+            "force_refresh": {
+                "type": "boolean",
+                "description": "Ignore cached analysis results and call the LLM again. Default is false.",
+                "default": False,
+            },
         },
         "required": ["html_path", "project_name"],
     }
 
-    # 项目基本结构分析提示词
-    _analyze_structure_prompt = """请分析下面的HTML原型界面和API接口文档（如果提供），提取关键业务实体、功能和API接口，用于后续生成Springboot项目。
-项目名称: {project_name}
-项目包路径: {package_name}.{project_name}
-数据库名称: {database_name}
-
-请分析以下HTML原型界面，提取关键业务实体和功能:
-```html
-{html_content}
-```
+    # 提示词中固定的说明和JSON格式示例放在前面，项目相关的输入放在末尾，
+    # 使同一阶段的多次请求共享相同的前缀，便于服务端缓存
 
-{api_doc_section}
+    # 项目基本结构分析提示词
+    _analyze_structure_prompt = """请分析本消息末尾提供的HTML原型界面和API接口文档（如果提供），提取关键业务实体、功能和API接口，用于后续生成Springboot项目。
 
 请根据分析结果，提供项目的基本结构信息:
 1. 主要业务实体对象列表及其属性
@@ -100,22 +352,28 @@ class HTMLToSpringboot(BaseTool):
   ]
 }}
 ```
-"""
 
-    # 第二步：生成SQL文件、Application启动类和Bean类提示词
-    _basic_files_prompt = """根据之前分析的项目结构信息，请生成Springboot项目的基础文件，包括SQL脚本、Application启动类和Bean实体类。
+以下是本次项目的输入信息。
 项目名称: {project_name}
 项目包路径: {package_name}.{project_name}
 数据库名称: {database_name}
 
-项目基本结构:
-{project_structure}
+请分析以下HTML原型界面，提取关键业务实体和功能:
+```html
+{html_content}
+```
+
+{api_doc_section}
+"""
+
+    # 第二步：生成SQL文件、Application启动类和Bean类提示词
+    _basic_files_prompt = """根据之前分析的项目结构信息（见本消息末尾），请生成Springboot项目的基础文件，包括SQL脚本、Application启动类和Bean实体类。
 
 请生成以下文件:
 1. src/main/resources/schema.sql - 包含所有表的创建语句
 2. src/main/resources/data.sql - 包含必要的测试数据插入语句
-3. src/main/java/{package_path}/{project_name}/Application.java - 主启动类
-4. 所有的实体类({package_name}.{project_name}.entity包下)，包含完整的注解和属性
+3. Java源码目录下的Application.java - 主启动类
+4. 所有的实体类(项目包路径下的entity包)，包含完整的注解和属性
 5. application.yml - 包含完整的数据库连接等配置
 6. pom.xml - 包含Springboot2、MyBatis、MySQL等所有必要依赖
 
@@ -136,28 +394,28 @@ class HTMLToSpringboot(BaseTool):
   ]
 }}
 ```
-"""
 
-    # 第三步：生成完整项目文件提示词
-    _complete_project_prompt = """现在请基于已生成的基础文件，生成Springboot项目的所有剩余文件，包括Controller、Service、Mapper等。请确保这些文件与已有的Bean类和API设计保持一致。
+以下是本次项目的输入信息。
 项目名称: {project_name}
 项目包路径: {package_name}.{project_name}
+Java源码目录: src/main/java/{package_path}/{project_name}
 数据库名称: {database_name}
 
 项目基本结构:
 {project_structure}
+"""
 
-已生成的基础文件:
-{basic_files_content}
+    # 第三步：生成完整项目文件提示词
+    _complete_project_prompt = """现在请基于已生成的基础文件（见本消息末尾），生成Springboot项目的所有剩余文件，包括Controller、Service、Mapper等。请确保这些文件与已有的Bean类和API设计保持一致。
 
-请一次性生成以下所有剩余文件:
-1. 所有实体对应的Controller类({package_name}.{project_name}.controller包下)
-2. 所有实体对应的Service接口({package_name}.{project_name}.service包下)和实现类({package_name}.{project_name}.service.impl包下)
-3. 所有实体对应的Mapper接口({package_name}.{project_name}.mapper包下)和XML映射文件(src/main/resources/mapper目录下)
-4. 通用响应类({package_name}.{project_name}.common.ResponseResult)
-5. 异常处理类({package_name}.{project_name}.exception包下)
-6. 工具类({package_name}.{project_name}.utils包下)
-7. 配置类({package_name}.{project_name}.config包下)
+请一次性生成以下所有剩余文件（包名均相对于项目包路径）:
+1. 所有实体对应的Controller类(controller包下)
+2. 所有实体对应的Service接口(service包下)和实现类(service.impl包下)
+3. 所有实体对应的Mapper接口(mapper包下)和XML映射文件(src/main/resources/mapper目录下)
+4. 通用响应类(common.ResponseResult)
+5. 异常处理类(exception包下)
+6. 工具类(utils包下)
+7. 配置类(config包下)
 
 请确保:
 1. Controller实现符合API文档定义，使用通用响应对象包装返回结果
@@ -177,6 +435,30 @@ class HTMLToSpringboot(BaseTool):
   ]
 }}
 ```
+
+以下是本次项目的输入信息。
+项目名称: {project_name}
+项目包路径: {package_name}.{project_name}
+数据库名称: {database_name}
+
+项目基本结构:
+{project_structure}
+
+已生成的基础文件:
+{basic_files_content}
+"""
+
+    # 为真时在生成基础文件的同时，根据实体定义推测生成完整项目文件（两次LLM调用并行，可能略降低质量）
+    speculative_generation: bool = False
+
+    # 各阶段共用的生成要求，作为系统消息放在请求最前面；内容固定，可被服务端作为提示词前缀缓存
+    _generation_rules = """特别注意：
+1. 确保生成完整的代码实现，不要省略任何部分
+2. 不要使用省略号、TODO注释或者其他方式跳过代码片段
+3. 请仔细检查生成的JSON格式确保正确无误
+4. 每个方法和函数必须有完整的实现
+5. 确保生成所有必要的文件
+6. 为了使代码更加清晰，使用完整类名而非自动导入
 """
 
     # 保存生成的文件用于后续参考
@@ -192,6 +474,44 @@ class HTMLToSpringboot(BaseTool):
         self._progress = (step / self._total_steps) * 100
         logger.info(f"进度: {self._progress:.1f}% - {message}")
 
+    def _entities_preview(self, project_structure: Dict) -> str:
+        """根据项目结构中的实体定义生成简要说明，在基础文件生成完成前代替其内容"""
+        lines = ["(基础文件正在同时生成，以下为实体类定义摘要)"]
+        for entity in project_structure.get("entities", []):
+            fields = ", ".join(
+                f"{field.get('name')}: {field.get('type')}" for field in entity.get("fields", [])
+            )
+            lines.append(f"// entity/{entity.get('name')}.java (表: {entity.get('tableName')}) {fields}")
+        return "\n".join(lines)
+
+    def _cache_file(self, prompt: str) -> str:
+        """LLM结果缓存文件路径，以完整提示词的哈希为键（提示词已包含全部输入）"""
+        key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(config.workspace_root, ".cache", "h2sb", f"{key}.json")
+
+    def _load_cached_result(self, prompt: str) -> Optional[Dict]:
+        """读取缓存的LLM结果，不存在或无法解析时返回None"""
+        try:
+            with open(self._cache_file(prompt), "r", encoding="utf-8") as f:
+                return _json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取缓存失败，将重新生成: {str(e)}")
+            return None
+
+    def _store_cached_result(self, prompt: str, result: Dict) -> None:
+        """缓存LLM结果：先写临时文件再原子替换，避免并发读到半个文件"""
+        cache_file = self._cache_file(prompt)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(_json_dumps(result))
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"写入缓存失败: {str(e)}")
+
     async def _read_file_content(self, file_path: str) -> str:
         """读取文件内容"""
         try:
@@ -203,11 +523,27 @@ class HTMLToSpringboot(BaseTool):
             logger.error(f"读取文件失败: {str(e)}")
             return ""
 
-    async def _collect_files_content(self, project_dir: str, file_patterns: List[str], max_size: int = 6000) -> str:
-        """收集特定类型文件的内容，用于后续生成参考"""
+    async def _collect_files_content(
+        self, project_dir: str, file_patterns: List[str], max_size: int = 6000, compact: bool = False
+    ) -> str:
+        """收集特定类型文件的内容，用于后续生成参考；compact 为真时先压缩每个文件再计入大小限制"""
         content = []
         total_size = 0
 
+        # 本次生成的文件内容已保存在内存中，直接筛选，无需遍历目录和重新读取
+        if self._generated_files:
+            for rel_path, file_content in self._generated_files.items():
+                if file_content and any(pattern in rel_path for pattern in file_patterns):
+                    if compact:
+                        file_content = _compact_basic_file(rel_path, file_content)
+                    file_info = f"// {rel_path}\n{file_content}\n"
+                    if total_size + len(file_info) > max_size:
+                        content.append("...(更多文件内容已省略)")
+                        break
+                    content.append(file_info)
+                    total_size += len(file_info)
+            return "\n".join(content)
+
         for root, dirs, files in os.walk(project_dir):
             for file in files:
                 file_path = os.path.join(root, file)
@@ -217,6 +553,8 @@ class HTMLToSpringboot(BaseTool):
                 if any(pattern in rel_path for pattern in file_patterns):
                     file_content = await self._read_file_content(file_path)
                     if file_content:
+                        if compact:
+                            file_content = _compact_basic_file(rel_path, file_content)
                         # 添加文件名和内容
                         file_info = f"// {rel_path}\n{file_content}\n"
 
@@ -304,8 +642,9 @@ class HTMLToSpringboot(BaseTool):
         logger.info(f"已创建项目基本目录结构: {project_dir}")
         return project_dir
 
-    def _save_project_files(self, files: List[Dict[str, str]], project_dir: str, package_name: str = "com.demo") -> List[str]:
+    async def _save_project_files(self, files: List[Dict[str, str]], project_dir: str, package_name: str = "com.demo") -> List[str]:
         """保存项目文件到指定目录，返回保存的文件路径列表"""
+        writer = BatchFileWriter()
         saved_files = []
         # 写入文件
         for file_info in files:
@@ -321,32 +660,48 @@ class HTMLToSpringboot(BaseTool):
                     logger.info(f"修正Java文件路径: {file_info['path']} -> {file_path}")
                     file_info["path"] = file_path
 
-            # 构建完整路径
-            full_path = os.path.join(project_dir, file_path)
-
-            # 确保目录存在
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-            # 写入文件内容
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(file_info["content"])
+            # 加入待写入队列
+            writer.add(os.path.join(project_dir, file_path), file_info["content"])
 
             saved_files.append(file_path)
             # 存储已生成文件
             self._generated_files[file_path] = file_info["content"]
 
+        # 并发写入所有文件
+        await writer.flush()
+
         return saved_files
 
-    def _create_zip_file(self, project_dir: str) -> str:
-        """创建项目的ZIP压缩包"""
+    def _create_zip_file(self, project_dir: str, files_dict: Optional[Dict[str, str]] = None, compresslevel: int = 1) -> str:
+        """
+        创建项目的ZIP压缩包。提供 files_dict（相对路径 -> 内容）时直接从内存写入，
+        不再从磁盘重新读取；目录中不在 files_dict 里的文件仍从磁盘读取。
+        生成的多为小文本文件，默认使用较低的压缩级别，压缩率相差不大但速度快得多。
+        """
         zip_path = f"{project_dir}.zip"
         logger.info(f"开始创建ZIP文件: {zip_path}")
 
+        project_root = os.path.basename(project_dir)
+        date_time = time.localtime()[:6]
         file_count = 0
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+            written = set()
+            for rel_path, content in (files_dict or {}).items():
+                rel_path = os.path.normpath(rel_path).replace(os.sep, "/")
+                if rel_path in written:
+                    continue
+                info = zipfile.ZipInfo(f"{project_root}/{rel_path}", date_time=date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16  # 普通文件权限 rw-r--r--
+                zipf.writestr(info, content.encode("utf-8"), compresslevel=compresslevel)
+                written.add(rel_path)
+                file_count += 1
+
             for root, dirs, files in os.walk(project_dir):
                 for file in files:
                     file_path = os.path.join(root, file)
+                    if os.path.relpath(file_path, project_dir).replace(os.sep, "/") in written:
+                        continue
                     arcname = os.path.relpath(file_path, os.path.dirname(project_dir))
                     zipf.write(file_path, arcname)
                     file_count += 1
@@ -358,7 +713,7 @@ class HTMLToSpringboot(BaseTool):
         """从响应中提取JSON内容"""
         logger.info("开始从响应中提取JSON内容")
         # 提取JSON内容
-        json_match = re.search(r'```json\s*([\s\S]*?)\s*```', response)
+        json_match = _JSON_FENCE_RE.search(response)
         if json_match:
             json_content = json_match.group(1).strip()
             logger.info("成功通过代码块标记提取JSON内容")
@@ -375,14 +730,10 @@ class HTMLToSpringboot(BaseTool):
 
         # 解析JSON
         try:
-            # 尝试修复常见的JSON格式问题
-            # 1. 修复缺失的引号
-            fixed_content = re.sub(r'([{,]\s*)(\w+)(\s*:)', r'\1"\2"\3', json_content)
-            # 2. 修复错误的逗号（如对象末尾的逗号）
-            fixed_content = re.sub(r',\s*}', '}', fixed_content)
-            fixed_content = re.sub(r',\s*]', ']', fixed_content)
-
-            result = json.loads(fixed_content)
+            # 单次扫描修复常见的JSON格式问题（缺失的引号、末尾多余的逗号等）
+            fixed_content = repair_json(json_content)
+
+            result = _json_loads(fixed_content)
             files_count = len(result.get("files", []))
             logger.info(f"JSON解析成功，包含 {files_count} 个文件")
             return result
@@ -396,18 +747,10 @@ class HTMLToSpringboot(BaseTool):
         retry_count = 0
         last_error = None
 
-        # 修改提示词，强调生成完整代码且不要省略
-        enhanced_prompt = f"""
-{prompt}
-
-特别注意：
-1. 确保生成完整的代码实现，不要省略任何部分
-2. 不要使用省略号、TODO注释或者其他方式跳过代码片段
-3. 请仔细检查生成的JSON格式确保正确无误
-4. 每个方法和函数必须有完整的实现
-5. 确保生成所有必要的文件
-6. 为了使代码更加清晰，使用完整类名而非自动导入
-"""
+        # 生成要求放在系统消息中（支持时标记为缓存断点），每次请求的前缀保持一致
+        system_msgs = [{"role": "system", "content": self._generation_rules}]
+        prompt_msg = {"role": "user", "content": prompt}
+        retry_msg = None  # 重试时追加在末尾的反馈消息，不改动原提示词，前缀仍可命中缓存
 
         logger.info(f"开始使用LLM生成内容，超时时间: {timeout}秒，最大重试次数: {max_retries}")
 
@@ -420,15 +763,34 @@ class HTMLToSpringboot(BaseTool):
                 # 记录开始时间
                 start_time = time.time()
 
-                # 使用LLM生成内容，不要直接传timeout参数
-                messages = [{"role": "user", "content": enhanced_prompt}]
-                response = await llm.ask(messages, stream=False)
+                # 流式生成内容，边接收边定位JSON；JSON对象完整后即停止接收，不再等待之后的说明文字
+                messages = [prompt_msg, retry_msg] if retry_msg else [prompt_msg]
+                scanner = _JSONBlockScanner()
+                parts: List[str] = []
+                stream = llm.ask_stream(messages, system_msgs=system_msgs)
+                try:
+                    async for delta in stream:
+                        parts.append(delta)
+                        if scanner.feed(delta):
+                            break
+                finally:
+                    await stream.aclose()
+                response = "".join(parts)
+                if not response:
+                    raise ValueError("Empty response from streaming LLM")
 
                 # 计算耗时
                 duration = time.time() - start_time
                 logger.info(f"LLM生成内容完成，耗时: {duration:.2f}秒，响应长度: {len(response)}字符")
 
-                # 提取JSON内容
+                # 扫描已定位到完整的JSON对象时直接解析，否则按原方式从完整响应中提取
+                if scanner.start is not None and scanner.end is not None and scanner.end > 0:
+                    try:
+                        result = _json_loads(response[scanner.start:scanner.end])
+                        logger.info(f"JSON解析成功，包含 {len(result.get('files', []))} 个文件")
+                        return result
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"流式定位的JSON解析失败，改为完整提取: {e}")
                 return await self._extract_json_content(response)
 
             except Exception as e:
@@ -442,66 +804,22 @@ class HTMLToSpringboot(BaseTool):
                     return {"files": []}
 
                 # 在重试时进一步强化提示
-                enhanced_prompt = f"""
-{enhanced_prompt}
-
-前一次生成出现了问题，请再次尝试并特别注意：
+                retry_msg = {
+                    "role": "user",
+                    "content": f"""前一次生成出现了问题，请再次尝试并特别注意：
 1. 生成更简洁的代码
 2. 确保JSON格式完全正确
 3. 减少代码的复杂度
 4. 优先生成最基础必要的功能
 5. 错误详情: {last_error}
-"""
+""",
+                }
                 # 指数退避
-                import asyncio
                 await asyncio.sleep(2 ** retry_count)
 
         # 这里理论上不会到达，但为了代码完整性添加
         return {"files": []}
 
-    async def _analyze_project_structure(self, html_content: str, api_doc_content: str, project_name: str, database_name: str) -> Dict:
-        """分析项目结构"""
-        # 准备API文档部分
-        api_doc_section = ""
-        if api_doc_content:
-            api_doc_section = f"""
-还请分析以下API接口文档，提取API规范和接口定义:
-```markdown
-{api_doc_content}
-```
-"""
-
-        prompt = self._analyze_structure_prompt.format(
-            project_name=project_name,
-            database_name=database_name,
-            html_content=html_content,
-            api_doc_section=api_doc_section
-        )
-
-        return await self._generate_with_llm(prompt)
-
-    async def _generate_basic_files(self, project_structure: Dict, project_name: str, database_name: str) -> List[Dict[str, str]]:
-        """生成基础文件"""
-        prompt = self._basic_files_prompt.format(
-            project_name=project_name,
-            database_name=database_name,
-            project_structure=json.dumps(project_structure, ensure_ascii=False, indent=2)
-        )
-
-        result = await self._generate_with_llm(prompt)
-        return result.get("files", [])
-
-    async def _generate_complete_project(self, project_structure: Dict, project_name: str, database_name: str) -> List[Dict[str, str]]:
-        """生成完整项目文件"""
-        prompt = self._complete_project_prompt.format(
-            project_name=project_name,
-            database_name=database_name,
-            project_structure=json.dumps(project_structure, ensure_ascii=False, indent=2)
-        )
-
-        result = await self._generate_with_llm(prompt)
-        return result.get("files", [])
-
     async def execute(
         self,
         html_path: str,
@@ -510,6 +828,7 @@ class HTMLToSpringboot(BaseTool):
         database_name: str = "",
         package_name: str = "com.demo",
         output_path: str = "springboot_projects",
+        force_refresh: bool = False,
     ) -> ToolResult:
         """
         将HTML原型界面和API接口文档转换为Springboot+MyBatis后端项目。
@@ -521,10 +840,12 @@ class HTMLToSpringboot(BaseTool):
             database_name (str, optional): 数据库名称，默认使用项目名称。
             package_name (str, optional): 基础包名，默认为 'com.demo'。
             output_path (str, optional): 保存生成项目的路径，默认为工作区中的springboot_projects目录。
+            force_refresh (bool, optional): 为真时忽略已缓存的项目结构分析和基础文件结果，重新调用LLM。
 
         返回:
             ToolResult: 包含项目生成路径和操作状态的结果对象。
         """
+        speculative_task: Optional[asyncio.Task] = None  # 推测生成完整项目文件的任务，结束时若未完成则取消
         try:
             self._progress = 0
             self._update_progress(0, "开始生成Springboot项目...")
@@ -598,18 +919,27 @@ class HTMLToSpringboot(BaseTool):
 
             project_structure = None
             max_retries = 5
+            # 相同的HTML和API文档分析过时直接使用缓存结果
+            cached = None if force_refresh else self._load_cached_result(prompt)
 
             for retry in range(1, max_retries + 1):
                 try:
                     logger.info(f"尝试分析项目结构 (第{retry}/{max_retries}次)")
                     start_time = time.time()
 
-                    result = await self._generate_with_llm(prompt)
+                    from_cache = cached is not None
+                    if from_cache:
+                        result, cached = cached, None
+                        logger.info("使用缓存的项目结构分析结果")
+                    else:
+                        result = await self._generate_with_llm(prompt)
 
                     # 验证结果
                     if "entities" not in result or "modules" not in result or "tables" not in result:
                         raise ValueError("项目结构分析结果不完整，缺少必要字段")
 
+                    if not from_cache:
+                        self._store_cached_result(prompt, result)
                     project_structure = result
                     duration = time.time() - start_time
                     logger.info(f"项目结构分析完成，耗时: {duration:.2f}秒")
@@ -622,35 +952,55 @@ class HTMLToSpringboot(BaseTool):
                             success=False,
                         )
                     # 等待后重试
-                    import asyncio
                     await asyncio.sleep(2 * retry)
 
             # 步骤3: 生成基础文件 (SQL, Application, Bean)
             self._update_progress(1.5, "生成基础文件...")
+            # 项目结构只序列化一次，后续各阶段提示词共用
+            project_structure_json = _json_dumps(project_structure, indent=True)
             prompt = self._basic_files_prompt.format(
                 project_name=project_name,
                 package_name=package_name,
                 package_path=package_path,
                 database_name=database_name,
-                project_structure=json.dumps(project_structure, ensure_ascii=False, indent=2)
+                project_structure=project_structure_json
             )
 
+            # 推测执行：生成基础文件的同时，用实体定义摘要代替基础文件内容提前生成完整项目文件
+            if self.speculative_generation:
+                speculative_prompt = self._complete_project_prompt.format(
+                    project_name=project_name,
+                    package_name=package_name,
+                    database_name=database_name,
+                    project_structure=project_structure_json,
+                    basic_files_content=self._entities_preview(project_structure)
+                )
+                speculative_task = asyncio.create_task(self._generate_with_llm(speculative_prompt))
+
             basic_files = []
+            cached = None if force_refresh else self._load_cached_result(prompt)
 
             for retry in range(1, max_retries + 1):
                 try:
                     logger.info(f"尝试生成基础文件 (第{retry}/{max_retries}次)")
                     start_time = time.time()
 
-                    result = await self._generate_with_llm(prompt)
+                    from_cache = cached is not None
+                    if from_cache:
+                        result, cached = cached, None
+                        logger.info("使用缓存的基础文件生成结果")
+                    else:
+                        result = await self._generate_with_llm(prompt)
 
                     # 检查结果
                     basic_files = result.get("files", [])
                     if not basic_files or len(basic_files) < 4:  # 至少应该有SQL、Application和几个Bean
                         raise ValueError(f"基础文件生成数量不足: {len(basic_files)}个")
+                    if not from_cache:
+                        self._store_cached_result(prompt, result)
 
                     # 保存文件
-                    saved_files = self._save_project_files(basic_files, project_dir, package_name)
+                    saved_files = await self._save_project_files(basic_files, project_dir, package_name)
                     generated_file_list.extend(saved_files)
 
                     duration = time.time() - start_time
@@ -664,57 +1014,73 @@ class HTMLToSpringboot(BaseTool):
                             success=False,
                         )
                     # 等待后重试
-                    import asyncio
                     await asyncio.sleep(2 * retry)
 
-            # 收集基础文件内容供完整项目生成使用
-            basic_files_content = await self._collect_files_content(
-                project_dir,
-                ["entity", "schema.sql", "data.sql", "Application.java", "application.yml", "pom.xml"]
-            )
-
             # 步骤4: 生成完整项目文件
             self._update_progress(2, "生成完整项目文件...")
-            prompt = self._complete_project_prompt.format(
-                project_name=project_name,
-                package_name=package_name,
-                database_name=database_name,
-                project_structure=json.dumps(project_structure, ensure_ascii=False, indent=2),
-                basic_files_content=basic_files_content
-            )
-
             complete_files = []
+            if speculative_task is not None:
+                # 等待推测生成的结果；路径与基础文件重复时以基础文件为准
+                result = await speculative_task
+                basic_paths = set(generated_file_list)
+                complete_files = [
+                    file_info for file_info in result.get("files", [])
+                    if file_info["path"] not in basic_paths
+                    and f"src/main/java/{file_info['path']}" not in basic_paths
+                ]
+                if len(complete_files) >= 5:
+                    saved_files = await self._save_project_files(complete_files, project_dir, package_name)
+                    generated_file_list.extend(saved_files)
+                    logger.info(f"使用推测生成的完整项目文件，共{len(complete_files)}个文件")
+                else:
+                    logger.warning(f"推测生成的项目文件数量不足: {len(complete_files)}个，按常规流程重新生成")
+                    complete_files = []
+
+            if not complete_files:
+                # 收集基础文件内容供完整项目生成使用
+                basic_files_content = await self._collect_files_content(
+                    project_dir,
+                    ["entity", "schema.sql", "data.sql", "Application.java", "application.yml", "pom.xml"],
+                    compact=True,
+                )
 
-            for retry in range(1, max_retries + 1):
-                try:
-                    logger.info(f"尝试生成完整项目文件 (第{retry}/{max_retries}次)")
-                    start_time = time.time()
+                prompt = self._complete_project_prompt.format(
+                    project_name=project_name,
+                    package_name=package_name,
+                    database_name=database_name,
+                    project_structure=project_structure_json,
+                    basic_files_content=basic_files_content
+                )
 
-                    result = await self._generate_with_llm(prompt)
+                for retry in range(1, max_retries + 1):
+                    try:
+                        logger.info(f"尝试生成完整项目文件 (第{retry}/{max_retries}次)")
+                        start_time = time.time()
 
-                    # 检查结果
-                    complete_files = result.get("files", [])
-                    if not complete_files or len(complete_files) < 5:  # 至少应该有一些Controller、Service等文件
-                        raise ValueError(f"项目文件生成数量不足: {len(complete_files)}个")
+                        result = await self._generate_with_llm(prompt)
 
-                    # 保存文件
-                    saved_files = self._save_project_files(complete_files, project_dir, package_name)
-                    generated_file_list.extend(saved_files)
+                        # 检查结果
+                        complete_files = result.get("files", [])
+                        if not complete_files or len(complete_files) < 5:  # 至少应该有一些Controller、Service等文件
+                            raise ValueError(f"项目文件生成数量不足: {len(complete_files)}个")
 
-                    duration = time.time() - start_time
-                    logger.info(f"完整项目文件生成完成，共{len(complete_files)}个文件，耗时: {duration:.2f}秒")
-                    break
-                except Exception as e:
-                    logger.error(f"完整项目文件生成失败 (尝试 {retry}/{max_retries}): {str(e)}")
-                    if retry == max_retries:
-                        logger.warning("在最大重试次数后仍未成功生成所有文件，将使用已生成的文件继续")
+                        # 保存文件
+                        saved_files = await self._save_project_files(complete_files, project_dir, package_name)
+                        generated_file_list.extend(saved_files)
+
+                        duration = time.time() - start_time
+                        logger.info(f"完整项目文件生成完成，共{len(complete_files)}个文件，耗时: {duration:.2f}秒")
                         break
-                    # 等待后重试
-                    import asyncio
-                    await asyncio.sleep(2 * retry)
+                    except Exception as e:
+                        logger.error(f"完整项目文件生成失败 (尝试 {retry}/{max_retries}): {str(e)}")
+                        if retry == max_retries:
+                            logger.warning("在最大重试次数后仍未成功生成所有文件，将使用已生成的文件继续")
+                            break
+                        # 等待后重试
+                        await asyncio.sleep(2 * retry)
 
             # 创建ZIP文件
-            zip_path = self._create_zip_file(project_dir)
+            zip_path = self._create_zip_file(project_dir, self._generated_files)
 
             self._update_progress(3, "项目生成完成！")
 
@@ -777,3 +1143,8 @@ class HTMLToSpringboot(BaseTool):
                 error=f"Springboot项目生成失败: {str(e)}",
                 success=False,
             )
+
+        finally:
+            # 任何提前返回或异常都不能让推测任务在后台继续运行；已完成的任务调用cancel()无影响
+            if speculative_task is not None:
+                speculative_task.cancel()
@@ -6,10 +6,10 @@ import json
 from typing import Dict, List, Optional
 import time
 import asyncio
-import aiofiles
 import hashlib
 
 from app.tool.base import BaseTool, ToolResult  # 从基础工具类导入
+from app.tool.file_operators import BatchFileWriter  # 导入批量文件写入器
 from app.logger import logger  # 导入日志记录器
 from app.config import config  # 导入配置模块
 from app.llm import LLM  # 导入LLM模块
@@ -203,14 +203,9 @@ HTML原型界面:
         start_time = time.time()
         logger.info(f"开始写入文件，总文件数: {len(files)}")
 
+        writer = BatchFileWriter()
         created_files = []
         for file_info in files:
-            file_path = os.path.join(project_dir, file_info["path"])
-            dir_path = os.path.dirname(file_path)
-
-            # 确保目录存在
-            os.makedirs(dir_path, exist_ok=True)
-
             # 获取文件内容
             content = file_info["content"]
 
@@ -220,12 +215,12 @@ HTML原型界面:
             elif not isinstance(content, str):
                 content = str(content)
 
-            # 写入文件
-            async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-                await f.write(content)
-
+            writer.add(os.path.join(project_dir, file_info["path"]), content)
             created_files.append(file_info["path"])
 
+        # 并发写入所有文件
+        await writer.flush()
+
         duration = time.time() - start_time
         logger.info(f"文件写入完成，共写入 {len(created_files)} 个文件，耗时: {duration:.2f}秒")
         return created_files
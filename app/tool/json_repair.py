@@ -0,0 +1,73 @@
+"""修复LLM输出中常见的JSON格式问题，供各代码生成工具共用。"""
+
+import re
+from typing import List
+
+
+_BARE_WORD_RE = re.compile(r"\w+")
+
+
+def repair_json(text: str) -> str:
+    """
+    单次扫描修复LLM输出中常见的JSON格式问题：未加引号的键名、末尾多余的逗号、单引号字符串。
+    扫描时区分字符串内外，字符串内部的内容（如英文撇号）保持不变。
+    """
+    out: List[str] = []
+    n = len(text)
+    i = 0
+    last = ""  # 上一个输出的非空白字符（字符串记为 '"'）
+    while i < n:
+        ch = text[i]
+        if ch == '"' or ch == "'":
+            # 找到未转义的结束引号，整段复制
+            j = i + 1
+            while True:
+                j = text.find(ch, j)
+                if j == -1:
+                    j = n  # 字符串未闭合，复制到末尾
+                    break
+                k = j - 1
+                while text[k] == "\\":
+                    k -= 1
+                if (j - k) % 2 == 1:  # 前面有偶数个反斜杠，引号未被转义
+                    break
+                j += 1
+            if ch == '"':
+                out.append(text[i : j + 1])
+            else:
+                # 单引号字符串改为双引号，内部的双引号需要转义
+                body = text[i + 1 : j].replace("\\'", "'").replace('"', '\\"')
+                out.append(f'"{body}"')
+            i = j + 1
+            last = '"'
+        elif ch == ",":
+            # 逗号后（跳过空白）紧跟 } 或 ] 时丢弃该逗号
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j < n and text[j] in "}]":
+                i += 1
+                continue
+            out.append(ch)
+            last = ch
+            i += 1
+        elif ch == "_" or ch.isalnum():
+            m = _BARE_WORD_RE.match(text, i)
+            word = m.group()
+            i = m.end()
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            # 位于 { 或 , 之后且后跟冒号的裸词是键名，补上引号
+            if last in ("{", ",") and j < n and text[j] == ":":
+                out.append(f'"{word}"')
+                last = '"'
+            else:
+                out.append(word)
+                last = word[-1]
+        else:
+            out.append(ch)
+            if not ch.isspace():
+                last = ch
+            i += 1
+    return "".join(out)
@@ -0,0 +1,44 @@
+"""
+JSON 解析与序列化的统一入口。
+
+orjson 为可选依赖：安装时使用它以加快大段 JSON 的处理，否则回退到标准库 json。
+两种实现的输出保持一致：非 ASCII 字符不转义、无缩进时使用紧凑分隔符、允许非字符串键。
+orjson 的 JSONDecodeError 是 json.JSONDecodeError 的子类，调用方统一捕获后者即可。
+"""
+
+import json
+from typing import Any, Union
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        """序列化为 UTF-8 编码的 JSON 字节，indent 为 True 时缩进两个空格"""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+
+else:
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """解析 JSON 字符串或字节"""
+        return json.loads(data)
+
+    def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        """序列化为 UTF-8 编码的 JSON 字节，indent 为 True 时缩进两个空格"""
+        return dumps(obj, indent).encode("utf-8")
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """序列化为 JSON 字符串，indent 为 True 时缩进两个空格"""
+    if orjson is not None:
+        return dumps_bytes(obj, indent).decode()
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
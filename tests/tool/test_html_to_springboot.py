@@ -0,0 +1,101 @@
+import pytest
+
+from app.tool.html_to_springboot import _compact_sql, _JSONBlockScanner
+
+
+def _scan(chunks):
+    """依次投喂各段内容，返回扫描器、完整文本以及对象完整时所在的段序号"""
+    scanner = _JSONBlockScanner()
+    done_at = None
+    for i, chunk in enumerate(chunks):
+        if scanner.feed(chunk):
+            done_at = i
+            break
+    return scanner, "".join(chunks), done_at
+
+
+def test_object_in_single_chunk():
+    text = '说明\n```json\n{"files": [{"path": "a.java"}]}\n```\n后续说明'
+    scanner, full, done_at = _scan([text])
+
+    assert done_at == 0
+    assert full[scanner.start : scanner.end] == '{"files": [{"path": "a.java"}]}'
+
+
+def test_object_split_across_chunks():
+    chunks = ["前言 ``", "`js", 'on\n{"fi', 'les": [', "1, 2]", "}\n```", "结尾"]
+    scanner, full, done_at = _scan(chunks)
+
+    assert done_at == 5
+    assert full[scanner.start : scanner.end] == '{"files": [1, 2]}'
+
+
+def test_braces_and_escapes_inside_strings():
+    content = r'{"code": "class A { void f() { x = \"}\"; } }", "n": [1]}'
+    chunks = ["```json\n", content[:15], content[15:31], content[31:], "\n```"]
+    scanner, full, done_at = _scan(chunks)
+
+    assert done_at == 3
+    assert full[scanner.start : scanner.end] == content
+
+
+def test_escape_split_at_chunk_boundary():
+    content = '{"s": "a\\\\"}'
+    split = content.index("\\") + 1
+    chunks = ["```json\n", content[:split], content[split:]]
+    scanner, full, done_at = _scan(chunks)
+
+    assert done_at == 2
+    assert full[scanner.start : scanner.end] == content
+
+
+def test_text_before_fence_is_ignored():
+    scanner, full, done_at = _scan(['{"not": "fenced"} ```json\n{"a": 1}'])
+
+    assert done_at == 0
+    assert full[scanner.start : scanner.end] == '{"a": 1}'
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        ['```json\n[{"path": "a.java"}]\n```'],
+        ["```json\n", "[", '{"path": "a.java"}', "]", "\n```", "说明"],
+    ],
+)
+def test_top_level_array_reads_whole_response(chunks):
+    scanner, _, done_at = _scan(chunks)
+
+    assert done_at is None
+    assert scanner.skipped
+    assert scanner.end is None
+
+
+def test_incomplete_object_is_not_done():
+    scanner, _, done_at = _scan(["```json\n", '{"files": [', '{"path": "a"}'])
+
+    assert done_at is None
+    assert scanner.start is not None
+    assert scanner.end is None
+
+
+def test_compact_sql_strips_comments_after_quoted_defaults():
+    sql = """CREATE TABLE user (
+    id INT PRIMARY KEY, -- 主键
+    name VARCHAR(50) DEFAULT '' , -- name
+    age INT,
+    note VARCHAR(20) DEFAULT '--', -- 备注
+    email VARCHAR(100)
+);
+-- 测试数据
+INSERT INTO user VALUES (1, 'a;b', 1, '--', 'x@y.z');
+INSERT INTO user VALUES (2, 'c', 2, '', 'p@q.r');
+"""
+    compact = _compact_sql(sql)
+
+    assert compact.splitlines() == [
+        "CREATE TABLE user ( id INT PRIMARY KEY, name VARCHAR(50) DEFAULT '' , "
+        "age INT, note VARCHAR(20) DEFAULT '--', email VARCHAR(100) );",
+        "INSERT INTO user VALUES (1, 'a;b', 1, '--', 'x@y.z');",
+        "-- (1 more rows)",
+    ]